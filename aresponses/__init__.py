@@ -1,9 +1,15 @@
 __all__ = [
+    "FaultProfile",
+    "RateLimit",
     "Response",
     "ResponsesMockServer",
+    "WebSocket",
     "aresponses",
 ]
 
 from aiohttp.web import Response
 
+from aresponses.faults import FaultProfile
+from aresponses.limits import RateLimit
 from aresponses.main import ResponsesMockServer, aresponses
+from aresponses.websocket import WebSocket
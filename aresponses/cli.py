@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import sys
+
+from aresponses.replay import load_requests, replay
+from aresponses.standalone import load_route_file, serve
+
+
+def _host_mapping(text):
+    source, sep, target = text.partition("=")
+    if not sep or not source or not target:
+        raise argparse.ArgumentTypeError(f"expected FROM=TO, got {text!r}")
+    return source, target
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="python -m aresponses")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser(
+        "serve", help="serve the routes of a route file on a listening socket"
+    )
+    serve_parser.add_argument("routes", help="path of a JSON route file")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument(
+        "--map-host",
+        metavar="FROM=TO",
+        type=_host_mapping,
+        action="append",
+        default=[],
+        help="match requests with Host header FROM as if they were sent to TO",
+    )
+
+    replay_parser = commands.add_parser(
+        "replay", help="replay requests saved with aresponses.replay.save_requests"
+    )
+    replay_parser.add_argument("requests", help="path of a JSON lines request file")
+    replay_parser.add_argument(
+        "--target", help="base URL to send requests to instead of their own URL"
+    )
+    replay_parser.add_argument("--concurrency", type=int, default=10)
+    replay_parser.add_argument(
+        "--rate",
+        type=float,
+        dest="rate_multiplier",
+        help="replay at the recorded pace times RATE (default: as fast as possible)",
+    )
+    replay_parser.add_argument(
+        "--duration", type=float, help="loop over the requests for DURATION seconds"
+    )
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    if args.command == "serve":
+        server = load_route_file(
+            args.routes,
+            host=args.host,
+            port=args.port,
+            host_map=dict(args.map_host),
+        )
+        try:
+            asyncio.run(serve(server))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "replay":
+        report = asyncio.run(
+            replay(
+                load_requests(args.requests),
+                target=args.target,
+                concurrency=args.concurrency,
+                rate_multiplier=args.rate_multiplier,
+                duration=args.duration,
+            )
+        )
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import gzip
+import zlib
+from functools import lru_cache
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+ENCODERS = {
+    # mtime=0 keeps the encoded body the same from run to run
+    "gzip": lambda body: gzip.compress(body, mtime=0),
+    "deflate": zlib.compress,
+}
+DECODERS = {
+    "gzip": gzip.decompress,
+    "deflate": zlib.decompress,
+}
+if brotli is not None:
+    ENCODERS["br"] = brotli.compress
+    DECODERS["br"] = brotli.decompress
+
+# used to break ties between equally acceptable encodings
+PREFERRED_ENCODINGS = ("br", "gzip", "deflate")
+
+
+def available_encodings(encodings=True):
+    """
+    The encodings to pre-compress with, in order of preference
+
+    `True` means every available encoding.  Brotli is skipped when neither
+    `brotli` nor `brotlicffi` is installed, any other unknown encoding is an
+    error.
+    """
+    if encodings is True:
+        return tuple(e for e in PREFERRED_ENCODINGS if e in ENCODERS)
+    if isinstance(encodings, str):
+        encodings = (encodings,)
+    unknown = set(encodings) - set(PREFERRED_ENCODINGS)
+    if unknown:
+        raise ValueError(f"Unsupported encodings: {', '.join(sorted(unknown))}")
+    return tuple(e for e in encodings if e in ENCODERS)
+
+
+@lru_cache(maxsize=256)
+def accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header into {encoding: q}
+
+    Clients send the same few headers over and over, so results are cached.
+    """
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        encoding, _, params = item.partition(";")
+        encoding = encoding.strip()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[encoding] = q
+    return accepted
+
+
+class CompressedBody:
+    """A body encoded once per encoding, when its route is added"""
+
+    __slots__ = ("identity", "variants")
+
+    def __init__(self, body, encodings=True):
+        self.identity = body
+        self.variants = {
+            encoding: ENCODERS[encoding](body)
+            for encoding in available_encodings(encodings)
+        }
+
+    def negotiate(self, accept_encoding):
+        """
+        Return (encoding, body) for a request's Accept-Encoding header
+
+        The encoding with the highest q value wins, ties going to the one
+        listed first when compressing.  The encoding is None when the
+        client accepts none of the variants.
+        """
+        if not accept_encoding or not self.variants:
+            return None, self.identity
+        accepted = accepted_encodings(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.variants:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        if best is None:
+            return None, self.identity
+        return best, self.variants[best]
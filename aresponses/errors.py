@@ -12,3 +12,11 @@ class UnusedRouteError(AresponsesAssertionError):
 
 class UnorderedRouteCallError(AresponsesAssertionError):
     pass
+
+
+class UnexpectedScenarioStateError(AresponsesAssertionError):
+    pass
+
+
+class UnexpectedCallCountError(AresponsesAssertionError):
+    pass
@@ -0,0 +1,142 @@
+import asyncio
+import random
+from collections import Counter
+
+from aiohttp import web
+from aiohttp.web_response import StreamResponse
+
+FAULT_ERROR = "error"
+FAULT_RESET = "reset"
+FAULT_TRUNCATE = "truncate"
+FAULT_SLOW_HEADERS = "slow_headers"
+FAULT_DROP = "drop"
+
+
+class PartialResponse(StreamResponse):
+    """
+    Send the headers and the first half of a response body, then break off
+
+    With `abort=True` the connection is reset, otherwise it is closed
+    cleanly, leaving the client with a body shorter than its Content-Length.
+    """
+
+    def __init__(self, response, *, abort):
+        headers = {k: v for k, v in response.headers.items() if k != "Content-Length"}
+        super().__init__(
+            status=response.status, reason=response.reason, headers=headers
+        )
+        body = response.body if isinstance(response.body, bytes) else b""
+        self.content_length = len(body)
+        self._partial_body = body[: len(body) // 2]
+        self._abort = abort
+        self.force_close()
+
+    async def write_eof(self, *_, **__):  # noqa
+        # may be sent early by a rate limit, then again by aiohttp
+        if self._eof_sent:
+            return
+        await self.write(self._partial_body)
+        self._eof_sent = True
+        transport = self._req.transport
+        if transport is not None:
+            if self._abort:
+                transport.abort()
+            else:
+                transport.close()
+
+
+class FaultProfile:
+    """
+    Randomly inject failures into the responses of a route
+
+    Each rate is the probability, between 0 and 1, that a request gets that
+    fault. At most one fault is applied per request. Faults are drawn from
+    a `random.Random(seed)` so a seeded profile fails the same requests on
+    every run.
+
+    :param error_rate: respond with one of `error_statuses` instead
+    :param reset_rate: send half of the body, then reset the connection
+    :param truncate_rate: send half of the body, then close the connection
+    :param slow_headers_rate: wait `slow_headers_delay` seconds before responding
+    :param drop_rate: reset the connection without responding
+    """
+
+    def __init__(
+        self,
+        *,
+        error_rate=0.0,
+        error_statuses=(500, 502, 503),
+        reset_rate=0.0,
+        truncate_rate=0.0,
+        slow_headers_rate=0.0,
+        slow_headers_delay=1.0,
+        drop_rate=0.0,
+        seed=None,
+    ):
+        self.error_statuses = tuple(error_statuses)
+        self.slow_headers_delay = slow_headers_delay
+        self.injected = Counter()
+        self._rng = random.Random(seed)
+        self._thresholds = []
+        total = 0.0
+        for fault, rate in (
+            (FAULT_ERROR, error_rate),
+            (FAULT_RESET, reset_rate),
+            (FAULT_TRUNCATE, truncate_rate),
+            (FAULT_SLOW_HEADERS, slow_headers_rate),
+            (FAULT_DROP, drop_rate),
+        ):
+            if rate < 0:
+                raise ValueError(f"{fault}_rate must not be negative")
+            if rate:
+                total += rate
+                self._thresholds.append((total, fault))
+        if total > 1:
+            raise ValueError("fault rates must not add up to more than 1")
+
+    def choose(self):
+        """Return the fault for the next request, or None"""
+        roll = self._rng.random()
+        for threshold, fault in self._thresholds:
+            if roll < threshold:
+                self.injected[fault] += 1
+                return fault
+        return None
+
+    def wrap(self, dispatch):
+        """Wrap a route's response dispatch so that it injects faults"""
+
+        async def faulty(request):
+            fault = self.choose()
+            if fault is None:
+                return await dispatch(request)
+
+            if fault == FAULT_ERROR:
+                return web.Response(status=self._rng.choice(self.error_statuses))
+
+            if fault == FAULT_DROP:
+                return _drop(request)
+
+            if fault == FAULT_SLOW_HEADERS:
+                await asyncio.sleep(self.slow_headers_delay)
+                return await dispatch(request)
+
+            response = await dispatch(request)
+            if not isinstance(response, web.Response):
+                return _drop(request)
+            return PartialResponse(response, abort=fault == FAULT_RESET)
+
+        return faulty
+
+    def __repr__(self):
+        rates = []
+        previous = 0.0
+        for threshold, fault in self._thresholds:
+            rates.append(f"{fault}_rate={threshold - previous:g}")
+            previous = threshold
+        return f"FaultProfile({', '.join(rates)})"
+
+
+def _drop(request):
+    request.transport.abort()
+    return web.Response()
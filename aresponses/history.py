@@ -0,0 +1,242 @@
+"""
+Records and indexes of `ResponsesMockServer.history`
+
+With `compact_history=True` the server keeps `RecordedRequest` and
+`RecordedResponse` instead of the aiohttp request and response objects,
+which hold on to protocol state, parsers and buffers long after the
+request was handled.  They expose the parts of the aiohttp API that tests
+usually inspect.
+
+`HistoryIndex` keeps the positions of history entries by route, host,
+method and path, and their arrival times, as requests are handled.
+"""
+
+import json
+import sys
+from array import array
+from bisect import bisect_left
+
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+
+def _headers(pairs):
+    return CIMultiDictProxy(CIMultiDict(pairs))
+
+
+def _charset(headers, default="utf-8"):
+    for name, value in headers:
+        if name.lower() == "content-type":
+            _, _, params = value.partition(";")
+            for param in params.split(";"):
+                key, _, charset = param.strip().partition("=")
+                if key.lower() == "charset" and charset:
+                    return charset.strip('"')
+    return default
+
+
+class RecordedRequest:
+    __slots__ = ("method", "host", "path_qs", "_headers", "_body")
+
+    def __init__(self, method, host, path_qs, headers, body):
+        self.method = sys.intern(method)
+        self.host = sys.intern(host)
+        self.path_qs = path_qs
+        self._headers = tuple((sys.intern(str(k)), v) for k, v in headers)
+        self._body = body
+
+    @classmethod
+    async def from_request(cls, request):
+        return cls(
+            request.method,
+            request.host,
+            request.raw_path,
+            request.headers.items(),
+            await request.read(),
+        )
+
+    @property
+    def rel_url(self):
+        return URL(self.path_qs, encoded=True)
+
+    @property
+    def url(self):
+        return URL(f"http://{self.host}{self.path_qs}", encoded=True)
+
+    @property
+    def path(self):
+        return self.rel_url.path
+
+    @property
+    def query_string(self):
+        return self.rel_url.query_string
+
+    @property
+    def query(self):
+        return self.rel_url.query
+
+    @property
+    def headers(self):
+        return _headers(self._headers)
+
+    @property
+    def charset(self):
+        return _charset(self._headers, None)
+
+    async def read(self):
+        return self._body
+
+    async def text(self):
+        return self._body.decode(_charset(self._headers))
+
+    async def json(self, *, loads=json.loads):
+        return loads(await self.text())
+
+    def __repr__(self):
+        return f"<RecordedRequest {self.method} {self.host}{self.path_qs}>"
+
+
+class RecordedResponse:
+    __slots__ = ("status", "reason", "_headers", "body")
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self._headers = tuple((sys.intern(str(k)), v) for k, v in headers)
+        # only kept when it is already bytes, which for text and json routes
+        # is shared by every response of the route
+        self.body = body
+
+    @classmethod
+    def from_response(cls, response):
+        if response is None:
+            return None
+        body = getattr(response, "body", None)
+        return cls(
+            response.status,
+            response.reason,
+            response.headers.items(),
+            body if isinstance(body, bytes) else None,
+        )
+
+    @property
+    def headers(self):
+        return _headers(self._headers)
+
+    @property
+    def text(self):
+        if self.body is None:
+            return None
+        return self.body.decode(_charset(self._headers))
+
+    def __repr__(self):
+        return f"<RecordedResponse {self.status} {self.reason}>"
+
+
+def _as_positions(positions):
+    return (positions,) if type(positions) is int else positions
+
+
+def _contains(positions, position):
+    i = bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+
+class HistoryIndex:
+    """
+    Positions of history entries by route, host, method and path
+
+    Positions are appended in increasing order, so each index is a sorted
+    array: counting the entries of one key is O(1) and reading them O(k).
+    Arrival times are usually in order too; when concurrent requests
+    complete out of order, time windows fall back to a sorted copy that is
+    rebuilt only after new entries arrived.
+    """
+
+    def __init__(self):
+        self.times = array("d")
+        self._by_route = {}
+        self._by_host = {}
+        self._by_method = {}
+        self._by_path = {}
+        self._in_order = True
+        # (len(times), positions sorted by arrival, their times) once
+        # entries were recorded out of order
+        self._order = None
+
+    def add(self, route, request, arrived):
+        position = len(self.times)
+        if self.times and arrived < self.times[-1]:
+            self._in_order = False
+        self.times.append(arrived)
+        for index, key in (
+            (self._by_route, route),
+            (self._by_host, request.host.lower()),
+            (self._by_method, request.method.upper()),
+            (self._by_path, request.path),
+        ):
+            positions = index.get(key)
+            if positions is None:
+                # most paths are only requested once, so a key starts out
+                # with a bare position rather than an array
+                index[key] = position
+            elif type(positions) is int:
+                index[key] = array("q", (positions, position))
+            else:
+                positions.append(position)
+
+    def clear(self):
+        self.__init__()
+
+    def positions(self, route=None, host=None, method=None, path=None):
+        """
+        Positions of the entries matching every given key, in order
+
+        Returns None when no key is given, meaning every entry.
+        """
+        candidates = []
+        if route is not None:
+            candidates.append((self._by_route, route))
+        if host is not None:
+            candidates.append((self._by_host, host.lower()))
+        if method is not None:
+            candidates.append((self._by_method, method.upper()))
+        if path is not None:
+            candidates.append((self._by_path, path))
+        if not candidates:
+            return None
+
+        lists = sorted(
+            (_as_positions(index.get(key, ())) for index, key in candidates), key=len
+        )
+        smallest, others = lists[0], lists[1:]
+        if not others:
+            return smallest
+        # O(k log n) for the k entries of the most selective key
+        return [p for p in smallest if all(_contains(other, p) for other in others)]
+
+    def count(self, route=None, host=None, method=None, path=None):
+        positions = self.positions(route, host, method, path)
+        return len(self.times) if positions is None else len(positions)
+
+    def window(self, since=None, until=None):
+        """Positions of the entries that arrived in [since, until), in order"""
+        times = self.times
+        if self._in_order:
+            start = 0 if since is None else bisect_left(times, since)
+            end = len(times) if until is None else bisect_left(times, until)
+            return range(start, end)
+
+        if self._order is None or self._order[0] != len(times):
+            order = sorted(range(len(times)), key=times.__getitem__)
+            self._order = (len(times), order, [times[p] for p in order])
+        _, order, sorted_times = self._order
+        start = 0 if since is None else bisect_left(sorted_times, since)
+        end = len(order) if until is None else bisect_left(sorted_times, until)
+        return sorted(order[start:end])
+
+    def in_window(self, position, since=None, until=None):
+        arrived = self.times[position]
+        return (since is None or arrived >= since) and (
+            until is None or arrived < until
+        )
@@ -0,0 +1,164 @@
+import asyncio
+import math
+
+from aiohttp import web
+from aiohttp.web_response import StreamResponse
+
+
+class RateLimit:
+    """
+    Emulate a quota limited API with a token bucket and a cap on in-flight requests
+
+    A limit can be shared by several routes (or attached to a host with
+    `ResponsesMockServer.limit_host`), in which case they draw from the same
+    bucket.  Requests over the limit are answered with `status` and a
+    `Retry-After` header, or wait their turn when `queue=True`.
+
+    :param rate: requests per second; None disables the token bucket
+    :param burst: size of the bucket, defaults to `rate` (at least 1)
+    :param max_in_flight: requests handled at once; None means unlimited
+    :param status: status of responses rejected by the token bucket
+    :param in_flight_status: status of responses rejected by `max_in_flight`
+    :param retry_after: seconds sent in `Retry-After`; by default the time
+        until the next token, rounded up
+    :param queue: wait for a token or slot instead of rejecting the request
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        *,
+        burst=None,
+        max_in_flight=None,
+        status=429,
+        in_flight_status=503,
+        retry_after=None,
+        queue=False,
+    ):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 1, 1)
+        self.max_in_flight = max_in_flight
+        self.status = status
+        self.in_flight_status = in_flight_status
+        self.retry_after = retry_after
+        self.queue = queue
+
+        self.accepted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._tokens = self.burst
+        self._updated = None
+        self._slots = None
+
+    @property
+    def stats(self):
+        """A snapshot of the live counters"""
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    async def call(self, dispatch, request):
+        """Run `dispatch(request)` within the limit, or return a rejection"""
+        if self.rate is not None:
+            wait = self._take_token()
+            if wait:
+                if not self.queue:
+                    self.rejected += 1
+                    return self._reject(self.status, wait)
+                self.queued += 1
+                await asyncio.sleep(wait)
+
+        if self.max_in_flight is None:
+            return await self._dispatch(dispatch, request)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self._slots.locked():
+            if not self.queue:
+                self.rejected += 1
+                return self._reject(self.in_flight_status, 1)
+            self.queued += 1
+        async with self._slots:
+            return await self._dispatch(dispatch, request)
+
+    async def _dispatch(self, dispatch, request):
+        self.accepted += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await dispatch(request)
+            await _send(response, request)
+            return response
+        finally:
+            self.in_flight -= 1
+
+    def _take_token(self):
+        """
+        Take a token from the bucket and return how long to wait for it
+
+        When queueing the token is reserved even if the bucket is empty, so
+        waiting requests are served in arrival order at `rate`.
+        """
+        now = asyncio.get_running_loop().time()
+        if self._updated is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        wait = (1 - self._tokens) / self.rate
+        if self.queue:
+            self._tokens -= 1
+        return wait
+
+    def _reject(self, status, wait):
+        retry_after = self.retry_after
+        if retry_after is None:
+            retry_after = max(1, math.ceil(wait))
+        return web.Response(
+            status=status,
+            headers={"Retry-After": str(retry_after)},
+            text="rate limit exceeded",
+        )
+
+    def __repr__(self):
+        return (
+            f"RateLimit(rate={self.rate!r}, burst={self.burst!r}, "
+            f"max_in_flight={self.max_in_flight!r}, queue={self.queue!r})"
+        )
+
+
+async def _send(response, request):
+    """
+    Send a response while its request still holds an in-flight slot
+
+    Building most responses takes no time, so the slot would otherwise be
+    released before aiohttp writes the body.  aiohttp then finds the
+    response already sent.  The in-memory transport has nothing to write.
+    """
+    if not isinstance(response, StreamResponse):
+        return
+    if getattr(request, "_payload_writer", None) is None:
+        return
+    transport = request.transport
+    if transport is None or transport.is_closing():
+        return
+    try:
+        await response.prepare(request)
+        await response.write_eof()
+    except ConnectionError:
+        # aiohttp will find the connection closed as well
+        pass
@@ -1,9 +1,16 @@
 import asyncio
+import heapq
+import itertools
+import json
 import logging
 import math
 import re
+import sys
+import time
 from copy import copy
-from typing import List, NamedTuple
+from functools import partial
+from types import MappingProxyType
+from typing import List, NamedTuple, Optional, Tuple
 
 try:
     from pytest_asyncio import fixture as asyncio_fixture
@@ -14,7 +21,7 @@ except ImportError:
     asyncio_fixture = pytest.fixture
 
 from aiohttp import web, ClientSession
-from aiohttp.client_reqrep import ClientRequest
+from aiohttp.client_reqrep import ClientRequest, ClientResponse
 from aiohttp.connector import TCPConnector
 from aiohttp.helpers import sentinel
 from aiohttp.test_utils import BaseTestServer
@@ -23,15 +30,33 @@ from aiohttp.web_response import StreamResponse, json_response
 from aiohttp.web_runner import ServerRunner
 from aiohttp.web_server import Server
 
+from aresponses.compression import CompressedBody
 from aresponses.errors import (
     NoRouteFoundError,
+    UnexpectedCallCountError,
+    UnexpectedScenarioStateError,
     UnusedRouteError,
     UnorderedRouteCallError,
 )
-from aresponses.utils import _text_matches_pattern, ANY
+from aresponses.faults import FaultProfile
+from aresponses.history import HistoryIndex, RecordedRequest, RecordedResponse
+from aresponses.limits import RateLimit
+from aresponses.transport import MemoryConnection, send as memory_send
+from aresponses.utils import _compile_pattern, ANY
+from aresponses.websocket import WebSocket
 
 logger = logging.getLogger(__name__)
 
+# marks responses that `raise_on_unmatched` turns into client side errors
+NO_ROUTE_HEADER = "AResponsesNoRoute"
+
+RESPONSE_COROUTINE = "coroutine"
+RESPONSE_CALLABLE = "callable"
+RESPONSE_TEXT = "text"
+RESPONSE_JSON = "json"
+RESPONSE_STATIC = "static"
+RESPONSE_WEBSOCKET = "websocket"
+
 
 class RawResponse(StreamResponse):
     """
@@ -54,7 +79,31 @@ class RawResponse(StreamResponse):
         await super().write_eof(self._body)
 
 
+# shared by the routes that don't match on headers or query parameters
+_NO_PATTERNS = MappingProxyType({})
+
+
 class Route:
+    __slots__ = (
+        "method_pattern",
+        "host_pattern",
+        "path_pattern",
+        "body_pattern",
+        "match_querystring",
+        "repeat",
+        "headers",
+        "query",
+        "response_kind",
+        "_match_method",
+        "_match_host",
+        "_match_path",
+        "_match_body",
+        "_match_headers",
+        "_match_query",
+        "_dispatch",
+        "_limit",
+    )
+
     def __init__(
         self,
         method_pattern=ANY,
@@ -63,6 +112,8 @@ class Route:
         body_pattern=ANY,
         match_querystring=False,
         repeat=1,
+        headers=None,
+        query=None,
     ):
         self.method_pattern = method_pattern
         self.host_pattern = host_pattern
@@ -70,42 +121,382 @@ class Route:
         self.body_pattern = body_pattern
         self.match_querystring = match_querystring
         self.repeat = repeat
+        self._match_method = _compile_pattern(method_pattern)
+        self._match_host = _compile_pattern(host_pattern)
+        self._match_path = _compile_pattern(path_pattern)
+        self._match_body = _compile_pattern(body_pattern)
+        # header names are case insensitive, query parameter names are not
+        self.headers = (
+            {k.lower(): v for k, v in headers.items()} if headers else _NO_PATTERNS
+        )
+        self.query = dict(query) if query else _NO_PATTERNS
+        self._match_headers = tuple(
+            (k, _compile_pattern(v)) for k, v in self.headers.items()
+        )
+        self._match_query = tuple(
+            (k, _compile_pattern(v)) for k, v in self.query.items()
+        )
+        # set by `ResponsesMockServer.add`
+        self.response_kind = None
+        self._dispatch = None
+        self._limit = None
 
     async def matches(self, request):
         path_to_match = request.path_qs if self.match_querystring else request.path
 
-        if not _text_matches_pattern(self.host_pattern, request.host):
+        if not self._match_host(request.host):
             return False
 
-        if not _text_matches_pattern(self.path_pattern, path_to_match):
+        if not self._match_path(path_to_match):
             return False
 
-        if not _text_matches_pattern(self.method_pattern, request.method.lower()):
+        if not self._match_method(request.method.lower()):
+            return False
+
+        # `request.headers` and `request.query` are parsed once per request
+        # and cached, so checking them on many routes is cheap
+        if self._match_headers and not _match_values(
+            self._match_headers, request.headers
+        ):
+            return False
+
+        if self._match_query and not _match_values(self._match_query, request.query):
             return False
 
         if self.body_pattern != ANY:
-            if not _text_matches_pattern(self.body_pattern, await request.text()):
+            if not self._match_body(await request.text()):
                 return False
 
         return True
 
+    def mismatches(self, request, body_text=""):
+        """
+        Return the names of the request parts this route does not match.
+
+        Unlike `matches` every part is checked, so it is only meant for
+        diagnosing requests that were not matched.
+        """
+        path_to_match = request.path_qs if self.match_querystring else request.path
+        failed = []
+        if not self._match_host(request.host):
+            failed.append("host")
+        if not self._match_path(path_to_match):
+            failed.append("path")
+        if not self._match_method(request.method.lower()):
+            failed.append("method")
+        if self._match_headers and not _match_values(
+            self._match_headers, request.headers
+        ):
+            failed.append("headers")
+        if self._match_query and not _match_values(self._match_query, request.query):
+            failed.append("query")
+        if self.body_pattern != ANY and not self._match_body(body_text):
+            failed.append("body")
+        return tuple(failed)
+
+    @property
+    def is_introspectable(self):
+        """Whether matching is fully described by the route's patterns"""
+        return type(self).matches is Route.matches and hasattr(self, "_match_host")
+
     def __str__(self):
+        extra = "".join(f" {name}={value}" for name, value in self._extra_patterns())
         return (
             f"method={self.method_pattern} host_pattern={self.host_pattern} "
             f"path={self.path_pattern} body={self.body_pattern} "
-            f"match_querystring={self.match_querystring}"
+            f"match_querystring={self.match_querystring}{extra}"
         )
 
     def __repr__(self):
+        extra = "".join(
+            f", {name}={repr(value)}" for name, value in self._extra_patterns()
+        )
         return (
             f"Route(method={repr(self.method_pattern)}, "
             f"host_pattern={repr(self.host_pattern)}, "
             f"path={repr(self.path_pattern)}, "
             f"body={repr(self.body_pattern)}, "
-            f"match_querystring={repr(self.match_querystring)})"
+            f"match_querystring={repr(self.match_querystring)}{extra})"
+        )
+
+    def _extra_patterns(self):
+        # only shown when set, so routes without them print as they always did
+        return [
+            (name, value)
+            for name, value in (
+                ("headers", getattr(self, "headers", None)),
+                ("query", getattr(self, "query", None)),
+            )
+            if value
+        ]
+
+
+def _match_values(matchers, values):
+    """Whether every (name, matcher) pair matches one of the values for name"""
+    for name, match in matchers:
+        if not any(match(value) for value in values.getall(name, ())):
+            return False
+    return True
+
+
+class RouteIndex:
+    """
+    Routes in insertion order, bucketed by literal host.
+
+    Every route gets an increasing sequence number. Routes with a literal
+    host pattern are kept in a per-host bucket and every other route in a
+    catch-all bucket, so finding the routes that may match a host only
+    touches those two buckets. Buckets are kept in insertion order and merged
+    by sequence number, which preserves "first added route wins".
+
+    The index can also be keyed by the values of some headers and query
+    parameters: a route requiring a literal value for one of them is only
+    a candidate for requests carrying that value.
+
+    The buckets are the only mapping kept per route: the sequence number is
+    the route's position in a plain list of every route added, and a byte
+    per route tells whether it is still in the index.
+    """
+
+    def __init__(self, headers=(), query=()):
+        self._header_keys = tuple(name.lower() for name in headers)
+        self._query_keys = tuple(query)
+        self._routes = []
+        self._live = bytearray()
+        self._size = 0
+        # no route before this sequence number is left
+        self._first = 0
+        # (host, *header values, *query values) -> {seq: route}, with None
+        # for the dimensions a route doesn't constrain to a literal value
+        self._buckets = {}
+
+    def add(self, route):
+        seq = len(self._routes)
+        self._routes.append(route)
+        self._live.append(1)
+        self._size += 1
+        self._buckets.setdefault(self._key(route), {})[seq] = route
+        return seq
+
+    def remove(self, seq):
+        _discard(self._buckets, self._key(self._routes[seq]), seq)
+        self._live[seq] = 0
+        self._size -= 1
+
+    def first_seq(self):
+        live = self._live
+        while self._first < len(live) and not live[self._first]:
+            self._first += 1
+        return self._first if self._first < len(live) else None
+
+    def __contains__(self, seq):
+        return self._live[seq] == 1
+
+    def candidates(self, request):
+        """(seq, route) pairs that may match `request`, in order"""
+        if self._header_keys or self._query_keys:
+            keys = itertools.product(*self._request_values(request))
+        else:
+            keys = ((request.host,), (None,))
+        buckets = [
+            list(bucket.items()) for bucket in map(self._buckets.get, keys) if bucket
+        ]
+        if len(buckets) == 1:
+            return buckets[0]
+        if not buckets:
+            return []
+        return heapq.merge(*buckets, key=_seq_key)
+
+    def __iter__(self):
+        return iter([route for seq, route in enumerate(self._routes) if seq in self])
+
+    def __len__(self):
+        return self._size
+
+    def _request_values(self, request):
+        """The bucket key values to look up for each dimension of `request`"""
+        values = [(request.host, None)]
+        headers = request.headers
+        for name in self._header_keys:
+            values.append((*dict.fromkeys(headers.getall(name, ())), None))
+        query = request.query
+        for name in self._query_keys:
+            values.append((*dict.fromkeys(query.getall(name, ())), None))
+        return values
+
+    def _key(self, route):
+        if not route.is_introspectable:
+            return (None,) * (1 + len(self._header_keys) + len(self._query_keys))
+        key = [route.host_pattern if isinstance(route.host_pattern, str) else None]
+        for name in self._header_keys:
+            key.append(_literal(route.headers.get(name)))
+        for name in self._query_keys:
+            key.append(_literal(route.query.get(name)))
+        return tuple(key)
+
+
+def _literal(pattern):
+    return pattern if isinstance(pattern, str) else None
+
+
+def _seq_key(item):
+    return item[0]
+
+
+def _discard(buckets, key, seq):
+    bucket = buckets[key]
+    del bucket[seq]
+    if not bucket:
+        del buckets[key]
+
+
+class Scenario:
+    """
+    A named state machine of routes, e.g. login -> token refresh -> listing
+
+    Routes are added to a state with `ResponsesMockServer.add(...,
+    scenario=..., state=..., next_state=...)`.  A request is only checked
+    against the routes of the scenario's current state, and matching a
+    route with a `next_state` moves the scenario there before its response
+    is built.  Scenario routes are checked before the other routes, and
+    scenarios in the order they were first added to.
+    """
+
+    def __init__(self, name, initial_state="start"):
+        self.name = name
+        self.initial_state = initial_state
+        self.state = initial_state
+        # every state entered, starting with the initial state
+        self.visited = [initial_state]
+        # state -> (RouteIndex, {seq: next state})
+        self._states = {}
+
+    def set_state(self, state):
+        self.state = state
+        self.visited.append(state)
+
+    def reset(self):
+        """Go back to the initial state"""
+        self.state = self.initial_state
+        self.visited = [self.initial_state]
+
+    def routes(self, state=None):
+        """The routes of `state` (all states by default) that are not used up"""
+        if state is not None:
+            states = [self._states[state]] if state in self._states else []
+        else:
+            states = self._states.values()
+        return [route for index, _ in states for route in index]
+
+    def assert_state(self, state):
+        if self.state != state:
+            raise UnexpectedScenarioStateError(
+                f"Scenario {self.name!r} is in state {self.state!r}, "
+                f"expected {state!r} (visited: {' -> '.join(self.visited)})"
+            )
+
+    def _add(self, state, route, next_state, index):
+        if state not in self._states:
+            self._states[state] = (index, {})
+        index, transitions = self._states[state]
+        seq = index.add(route)
+        if next_state is not None:
+            transitions[seq] = next_state
+
+    async def _respond(self, request, dispatch):
+        """
+        Respond with the first of the current state's routes matching `request`
+
+        Returns (route, response), or None.  `dispatch(route, consume,
+        request)` is given a `consume()` that uses the route up and moves to
+        its next state, or returns False if the state or the route changed
+        in the meantime.
+        """
+        state = self.state
+        routes = self._states.get(state)
+        if routes is None:
+            return None
+        index, transitions = routes
+        for seq, route in index.candidates(request):
+            if not await route.matches(request):
+                continue
+
+            def consume(seq=seq, route=route):
+                # the state or the routes may have changed while matching the
+                # body or waiting for a rate limit
+                if self.state != state or seq not in index:
+                    return False
+                route.repeat -= 1
+                if route.repeat <= 0:
+                    index.remove(seq)
+                next_state = transitions.get(seq)
+                if next_state is not None:
+                    self.set_state(next_state)
+                return True
+
+            response = await dispatch(route, consume, request)
+            if response is not _USED_UP:
+                return route, response
+        return None
+
+    def __repr__(self):
+        return f"Scenario({self.name!r}, state={self.state!r})"
+
+
+class _BodyResponder:
+    """
+    Build the response of a str, dict or list route
+
+    A slotted callable rather than a closure, as there is one per route.
+    """
+
+    __slots__ = ("response_class", "body", "content_type")
+
+    def __init__(self, response_class, body, content_type):
+        self.response_class = response_class
+        self.body = body
+        self.content_type = content_type
+
+    async def __call__(self, request):
+        return self.response_class(
+            body=self.body, content_type=self.content_type, charset="utf-8"
         )
 
 
+# returned by `ResponsesMockServer._dispatch` for a route used up by another
+# request while this one waited
+_USED_UP = object()
+
+
+def _restore_attribute(cls, name, own_value):
+    """Put back a patched class attribute, or drop it if it was inherited"""
+    if own_value is None:
+        delattr(cls, name)
+    else:
+        setattr(cls, name, own_value)
+
+
+class UnmatchedRequest(NamedTuple):
+    request: BaseRequest
+    body: bytes
+    # number of routes that had been added when the request arrived
+    routes_added: int
+
+
+class RouteDiagnosis(NamedTuple):
+    request: BaseRequest
+    closest_route: Optional[Route]
+    mismatched: Tuple[str, ...]
+    reason: str
+
+    def __str__(self):
+        return f"{_describe_request(self.request)}\n    {self.reason}"
+
+
+def _describe_request(request):
+    return f"No match found for request: {request.method} {request.host} {request.path}"
+
+
 class RoutingLog(NamedTuple):
     request: BaseRequest
     route: Route
@@ -116,16 +507,63 @@ class ResponsesMockServer(BaseTestServer):
     ANY = ANY
     Response = web.Response
     RawResponse = RawResponse
+    FaultProfile = FaultProfile
+    RateLimit = RateLimit
+    WebSocket = WebSocket
+    Scenario = Scenario
     INFINITY = math.inf
+    MAX_REPORTED_UNMATCHED = 10
     LOCALHOST = re.compile(r"127\.0\.0\.1:?\d{0,5}")
 
-    def __init__(self, *, scheme=sentinel, host="127.0.0.1", **kwargs):
-        self._responses = []
+    def __init__(
+        self,
+        *,
+        scheme=sentinel,
+        host="127.0.0.1",
+        in_memory=False,
+        index_headers=(),
+        index_query=(),
+        compact_history=False,
+        **kwargs,
+    ):
+        """
+        :param in_memory: Hand aiohttp client requests straight to the routing
+            table instead of sending them to a local socket.  Requests take
+            about half as long; most of the rest is the aiohttp client's own
+            work.  Responses must be `Response` objects (or anything `add`
+            turns into one).  `add` rejects `RawResponse` and
+            `WebSocket` responses, and handlers that stream need the socket
+            transport.
+        :param index_headers: Header names to index routes by.  Routes that
+            require a literal value for one of them are only checked against
+            requests carrying that value.
+        :param index_query: Query parameter names to index routes by.
+        :param compact_history: Keep a `RecordedRequest` and `RecordedResponse`
+            in `history` instead of the aiohttp objects, which use several
+            times more memory.
+        """
+        self.in_memory = in_memory
+        self.compact_history = compact_history
+        self._index_keys = {"headers": index_headers, "query": index_query}
+        self._responses = RouteIndex(**self._index_keys)
+        # every route ever added, in order, for diagnosing unmatched requests
+        self._registered = []
+        # (by host, by path, any host, routes bucketed so far), built by
+        # `diagnose_unmatched_requests` on first use
+        self._diagnosis_buckets = None
         self._exception = None
         self._unmatched_requests = []
+        self._unmatched_handler = None
+        self._host_limits = {}
+        self._scenarios = []
+        # route -> (scenario, state) for the routes added to a scenario
+        self._scenario_routes = {}
         self._first_unordered_route = None
         self._request_count = 0
+        # unlike `history`, not reset by `clear_history`
+        self._matched_count = 0
         self._history = []
+        self._history_index = HistoryIndex()
         super().__init__(scheme=scheme, host=host, **kwargs)
 
     async def _make_runner(self, debug=True, **kwargs):
@@ -134,11 +572,27 @@ class ResponsesMockServer(BaseTestServer):
 
     async def _handler(self, request):
         self._request_count += 1
+        arrived = time.monotonic()
         route, response = await self._find_response(request)
+        if route is not None:
+            self._matched_count += 1
+        elif self._unmatched_handler is not None:
+            response = await self._unmatched_handler(request)
         # ensures the request content is loaded even if the handler didn't
         # need it. This makes it available in`aresponses.history`
         await request.read()
-        self._history.append(RoutingLog(request, route, response))
+        self._sync_history_index()
+        if self.compact_history:
+            self._history.append(
+                RoutingLog(
+                    await RecordedRequest.from_request(request),
+                    route,
+                    RecordedResponse.from_response(response),
+                )
+            )
+        else:
+            self._history.append(RoutingLog(request, route, response))
+        self._history_index.add(route, request, arrived)
         return response
 
     def add(
@@ -152,6 +606,14 @@ class ResponsesMockServer(BaseTestServer):
         body_pattern=ANY,
         match_querystring=False,
         repeat=1,
+        headers=None,
+        query=None,
+        faults=None,
+        limit=None,
+        compress=None,
+        scenario=None,
+        state=None,
+        next_state=None,
     ):
         """
         Adds a route and response to the mock server.
@@ -167,13 +629,35 @@ class ResponsesMockServer(BaseTestServer):
         :param body_pattern:
         :param match_querystring:
         :param repeat:
-        :return:
+        :param headers: A dict of header name to pattern.  Each header must
+                        be present with a value matching its pattern.
+        :param query: A dict of query parameter name to pattern, matched like
+                      `headers` and regardless of parameter order.
+        :param faults: A FaultProfile injecting random failures into responses.
+        :param limit: A RateLimit throttling requests to this route.
+        :param compress: Pre-compress a text, json or `Response` body with
+                         every available encoding (True) or the given ones
+                         (e.g. ["gzip"]), sending the variant the request's
+                         Accept-Encoding prefers.
+        :param scenario: A Scenario the route belongs to.  It only matches
+                         while the scenario is in `state`.
+        :param state: The scenario state, by default its initial state.
+        :param next_state: The state the scenario moves to when the route
+                           matches.
+        :return: The Route, e.g. for `calls_for` and `assert_called`.
         """
+        if self.in_memory and isinstance(response, (RawResponse, WebSocket)):
+            raise ValueError(
+                f"{type(response).__name__} routes need the socket transport, "
+                "not in_memory=True"
+            )
+
+        # interned as the same few hosts and methods come up again and again
         if isinstance(host_pattern, str):
-            host_pattern = host_pattern.lower()
+            host_pattern = sys.intern(host_pattern.lower())
 
         if isinstance(method_pattern, str):
-            method_pattern = method_pattern.lower()
+            method_pattern = sys.intern(method_pattern.lower())
 
         if route is None:
             route = Route(
@@ -183,54 +667,237 @@ class ResponsesMockServer(BaseTestServer):
                 body_pattern=body_pattern,
                 match_querystring=match_querystring,
                 repeat=repeat,
+                headers=headers,
+                query=query,
             )
 
-        self._responses.append((route, response))
+        route.response_kind, route._dispatch = self._compile_response(response, route)
+        if compress:
+            route._dispatch = self._compile_compressed(response, compress)
+        if faults is not None:
+            route._dispatch = faults.wrap(route._dispatch)
+        # checked before the route is used up, see `_dispatch`
+        route._limit = limit
+        self._registered.append(route)
+        if scenario is None:
+            self._responses.add(route)
+            return route
+
+        if scenario not in self._scenarios:
+            self._scenarios.append(scenario)
+        if state is None:
+            state = scenario.initial_state
+        scenario._add(state, route, next_state, RouteIndex(**self._index_keys))
+        self._scenario_routes[route] = (scenario, state)
+        return route
 
     def add_local_passthrough(self, repeat=INFINITY):
         self.add(host_pattern=self.LOCALHOST, repeat=repeat, response=self.passthrough)
 
-    async def _find_response(self, request):
-        for i, (route, response) in enumerate(self._responses):
-            if not await route.matches(request):
-                continue
+    def limit_host(self, host, limit):
+        """
+        Throttle all matched requests to `host` with a RateLimit.
 
-            route.repeat -= 1
+        Applies on top of any limit given to the individual routes.
+        """
+        self._host_limits[host.lower()] = limit
 
-            if route.repeat <= 0:
-                del self._responses[i]
-            else:
-                self._responses[i] = (route, copy(response))
+    def set_unmatched_response(self, response="", *, status=404, delay=0):
+        """
+        Respond to requests that don't match any route.
+
+        By default such requests get no response at all, which clients see
+        as a server error or a disconnect.  Unmatched requests are still
+        reported by `assert_all_requests_matched`.
 
-            if i > 0 and self._first_unordered_route is None:
-                self._first_unordered_route = route
+        :param response: anything accepted by `add`
+        :param status: status code used for str, dict and list responses
+        :param delay: seconds to wait before responding
+        """
+        if isinstance(response, str):
+            response = self.Response(text=response, status=status)
+        elif isinstance(response, (dict, list)):
+            response = json_response(data=response, status=status)
+        _, dispatch = self._compile_response(response)
+
+        async def respond(request):
+            if delay:
+                await asyncio.sleep(delay)
+            return await dispatch(request)
+
+        self._unmatched_handler = respond
+
+    def raise_on_unmatched(self):
+        """
+        Raise `NoRouteFoundError` in the task that made an unmatched request.
 
-            response = await self._prepare_response(request, response)
-            return route, response
+        Only works for requests made with aiohttp while the server is active.
+        """
+
+        async def raise_error(request):
+            return self.Response(
+                text=_describe_request(request),
+                status=500,
+                headers={NO_ROUTE_HEADER: "1"},
+            )
+
+        self._unmatched_handler = raise_error
+
+    def reset_on_unmatched(self):
+        """Abort the connection of unmatched requests immediately"""
+
+        async def reset(request):
+            request.transport.abort()
+            return self.Response()
+
+        self._unmatched_handler = reset
+
+    async def _find_response(self, request):
+        for scenario in self._scenarios:
+            found = await scenario._respond(request, self._dispatch)
+            if found is not None:
+                return found
+
+        responses = self._responses
+        for seq, route in responses.candidates(request):
+            if not await route.matches(request) or seq not in responses:
+                continue
 
-        self._unmatched_requests.append(request)
+            def consume(seq=seq, route=route):
+                if seq not in responses:
+                    return False
+                route.repeat -= 1
+                if seq != responses.first_seq() and self._first_unordered_route is None:
+                    self._first_unordered_route = route
+                if route.repeat <= 0:
+                    responses.remove(seq)
+                return True
+
+            response = await self._dispatch(route, consume, request)
+            if response is not _USED_UP:
+                return route, response
+
+        body = await request.read()
+        self._unmatched_requests.append(
+            UnmatchedRequest(request, body, len(self._registered))
+        )
         return None, None
 
-    async def _prepare_response(self, request, response):
-        """Prepare response, depends on type."""
+    async def _dispatch(self, route, consume, request):
+        """
+        Build the response of a matched route, within its rate limits
+
+        The route is only used up once the limits let the request through,
+        so rejected requests don't count towards `repeat`.  Returns
+        `_USED_UP` if another request used the route up in the meantime.
+        """
+        host_limit = self._host_limits.get(request.host)
+        route_limit = getattr(route, "_limit", None)
+        if host_limit is None and route_limit is None:
+            if not consume():
+                return _USED_UP
+            return await route._dispatch(request)
+
+        async def dispatch(request):
+            if not consume():
+                return _USED_UP
+            return await route._dispatch(request)
+
+        if route_limit is not None:
+            dispatch = partial(route_limit.call, dispatch)
+        if host_limit is not None:
+            dispatch = partial(host_limit.call, dispatch)
+        return await dispatch(request)
+
+    def _compile_response(self, response, route=None):
+        """
+        Classify a response once, when its route is added.
+
+        Returns the response kind and a coroutine function that builds the
+        response for a request, so no introspection happens per request.
+        """
         if asyncio.iscoroutinefunction(response):
-            return await response(request)
+            return RESPONSE_COROUTINE, response
+
+        if isinstance(response, WebSocket):
+            return RESPONSE_WEBSOCKET, response.handle
 
         if callable(response):
-            return response(request)
+
+            async def call(request):
+                return response(request)
+
+            return RESPONSE_CALLABLE, call
 
         if isinstance(response, str):
-            return self.Response(body=response)
+            return RESPONSE_TEXT, _BodyResponder(
+                self.Response, response.encode("utf-8"), "text/plain"
+            )
 
         if isinstance(response, (dict, list)):
-            return json_response(data=response)
+            return RESPONSE_JSON, _BodyResponder(
+                self.Response, json.dumps(response).encode("utf-8"), "application/json"
+            )
 
-        return response
+        async def static(request):
+            # a response object can only be sent once, so hand out copies
+            # while the route is still in the routing table
+            if route is None or route.repeat > 0:
+                return copy(response)
+            return response
+
+        return RESPONSE_STATIC, static
+
+    def _compile_compressed(self, response, encodings):
+        """
+        Encode a static body once per encoding and negotiate it per request
+        """
+        if isinstance(response, str):
+            body = response.encode("utf-8")
+            status, reason = 200, None
+            headers = {"Content-Type": "text/plain; charset=utf-8"}
+        elif isinstance(response, (dict, list)):
+            body = json.dumps(response).encode("utf-8")
+            status, reason = 200, None
+            headers = {"Content-Type": "application/json; charset=utf-8"}
+        elif isinstance(response, web.Response) and isinstance(response.body, bytes):
+            body = response.body
+            status, reason = response.status, response.reason
+            headers = {
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() not in ("content-length", "content-encoding")
+            }
+        else:
+            raise ValueError(
+                "compress only applies to str, dict, list and Response bodies"
+            )
+
+        compressed = CompressedBody(body, encodings)
+        headers["Vary"] = "Accept-Encoding"
+        variant_headers = {None: headers}
+        for encoding in compressed.variants:
+            variant_headers[encoding] = {**headers, "Content-Encoding": encoding}
+
+        async def negotiated(request):
+            encoding, variant = compressed.negotiate(
+                request.headers.get("Accept-Encoding")
+            )
+            return self.Response(
+                body=variant,
+                status=status,
+                reason=reason,
+                headers=variant_headers[encoding],
+            )
+
+        return negotiated
 
     async def passthrough(self, request):
         """Make non-mocked network request"""
 
         class DirectTcpConnector(TCPConnector):
+            _aresponses_passthrough = True
+
             def _resolve_host(slf, *args, **kwargs):  # noqa
                 return self._old_resolver_mock(slf, *args, **kwargs)
 
@@ -261,7 +928,8 @@ class ResponsesMockServer(BaseTestServer):
                 return response
 
     async def __aenter__(self) -> "ResponsesMockServer":
-        await self.start_server(loop=self._loop)
+        if not self.in_memory:
+            await self.start_server(loop=self._loop)
 
         self._old_resolver_mock = TCPConnector._resolve_host
 
@@ -287,28 +955,73 @@ class ResponsesMockServer(BaseTestServer):
 
         ClientRequest.is_ssl = new_is_ssl
 
-        # store whether a request was an SSL request in the `AResponsesIsSSL` header
-        self._old_init = ClientRequest.__init__
+        # store whether a request was an SSL request in the `AResponsesIsSSL`
+        # header; the in-memory transport adds it to the server side request
+        if not self.in_memory:
+            self._old_init = ClientRequest.__init__
+
+            def new_init(_self, *largs, **kwargs):
+                self._old_init(_self, *largs, **kwargs)
+
+                is_ssl = "1" if self._old_is_ssl(_self) else ""
+                _self.update_headers({**_self.headers, "AResponsesIsSSL": is_ssl})
+
+            ClientRequest.__init__ = new_init
+
+        # raise errors flagged by `raise_on_unmatched` in the requesting task
+        self._old_response_start = ClientResponse.start
+
+        async def new_start(_self, *largs, **kwargs):
+            response = await self._old_response_start(_self, *largs, **kwargs)
+            if NO_ROUTE_HEADER in _self.headers:
+                message = await _self.text()
+                _self.release()
+                raise NoRouteFoundError(message)
+            return response
 
-        def new_init(_self, *largs, **kwargs):
-            self._old_init(_self, *largs, **kwargs)
+        ClientResponse.start = new_start
 
-            is_ssl = "1" if self._old_is_ssl(_self) else ""
-            _self.update_headers({**_self.headers, "AResponsesIsSSL": is_ssl})
+        # skip the network entirely, see `aresponses.transport`
+        if self.in_memory:
+            self._old_connect = TCPConnector.connect
+            self._old_send = ClientRequest.send
+            # `connect` is inherited from BaseConnector: remember what the
+            # classes themselves define so that `__aexit__` restores just that
+            self._own_connect = vars(TCPConnector).get("connect")
+            self._own_send = vars(ClientRequest).get("send")
 
-        ClientRequest.__init__ = new_init
+            async def new_connect(_self, *largs, **kwargs):
+                if getattr(_self, "_aresponses_passthrough", False):
+                    return await self._old_connect(_self, *largs, **kwargs)
+                return MemoryConnection()
+
+            async def new_send(_self, conn, *largs, **kwargs):
+                if isinstance(conn, MemoryConnection):
+                    return await memory_send(self, _self, conn)
+                return await self._old_send(_self, conn, *largs, **kwargs)
+
+            TCPConnector.connect = new_connect
+            ClientRequest.send = new_send
 
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         TCPConnector._resolve_host = self._old_resolver_mock
         ClientRequest.is_ssl = self._old_is_ssl
-        ClientRequest.__init__ = self._old_init
+        ClientResponse.start = self._old_response_start
+        if not self.in_memory:
+            ClientRequest.__init__ = self._old_init
+        else:
+            _restore_attribute(TCPConnector, "connect", self._own_connect)
+            _restore_attribute(ClientRequest, "send", self._own_send)
 
         await self.close()
 
     def assert_no_unused_routes(self, ignore_infinite_repeats=False):
-        for route, _ in self._responses:
+        routes = list(self._responses)
+        for scenario in self._scenarios:
+            routes.extend(scenario.routes())
+        for route in routes:
             if not ignore_infinite_repeats or route.repeat != self.INFINITY:
                 raise UnusedRouteError(f"Unused Route: {route}")
 
@@ -320,11 +1033,93 @@ class ResponsesMockServer(BaseTestServer):
 
     def assert_all_requests_matched(self):
         if self._unmatched_requests:
-            request = self._unmatched_requests[0]
-            raise NoRouteFoundError(
-                f"No match found for request: "
-                f"{request.method} {request.host} {request.path}"
+            diagnoses = self.diagnose_unmatched_requests(
+                limit=self.MAX_REPORTED_UNMATCHED
+            )
+            message = "\n".join(str(diagnosis) for diagnosis in diagnoses)
+            remaining = len(self._unmatched_requests) - len(diagnoses)
+            if remaining:
+                message += f"\n... and {remaining} more unmatched requests"
+            raise NoRouteFoundError(message)
+
+    def diagnose_unmatched_requests(self, limit=None) -> List[RouteDiagnosis]:
+        """
+        Explain why requests did not match, by finding the closest route for each.
+
+        Only routes sharing the request's host or path (plus routes with a
+        non-literal host) are considered, so this stays cheap for large
+        routing tables.
+        """
+        unmatched_requests = self._unmatched_requests[:limit]
+        if not unmatched_requests:
+            return []
+        by_host, by_path, anywhere = self._bucket_registered_routes()
+        diagnoses = []
+        for unmatched in unmatched_requests:
+            request = unmatched.request
+            seqs = {
+                *by_host.get(request.host, ()),
+                *by_path.get(request.path, ()),
+                *anywhere,
+            }
+            diagnoses.append(self._diagnose(unmatched, sorted(seqs)))
+        return diagnoses
+
+    def _bucket_registered_routes(self):
+        """
+        Bucket the routes added since the last call by literal host and path
+
+        Done here rather than as routes are added, so that adding routes
+        stays cheap for the (common) runs without unmatched requests.
+        """
+        if self._diagnosis_buckets is None:
+            self._diagnosis_buckets = ({}, {}, [], 0)
+        by_host, by_path, anywhere, bucketed = self._diagnosis_buckets
+        registered = self._registered
+        for seq in range(bucketed, len(registered)):
+            route = registered[seq]
+            if not route.is_introspectable:
+                continue
+            if isinstance(route.host_pattern, str):
+                by_host.setdefault(route.host_pattern, []).append(seq)
+            else:
+                anywhere.append(seq)
+            if isinstance(route.path_pattern, str):
+                by_path.setdefault(route.path_pattern, []).append(seq)
+        self._diagnosis_buckets = (by_host, by_path, anywhere, len(registered))
+        return by_host, by_path, anywhere
+
+    def _diagnose(self, unmatched, seqs):
+        request = unmatched.request
+        body_text = unmatched.body.decode(request.charset or "utf-8", "replace")
+        closest = None
+        for seq in seqs:
+            route = self._registered[seq]
+            mismatched = route.mismatches(request, body_text)
+            if closest is None or len(mismatched) < len(closest[2]):
+                closest = (seq, route, mismatched)
+                if not mismatched:
+                    break
+
+        if closest is None:
+            return RouteDiagnosis(request, None, (), "no route shares its host or path")
+
+        seq, route, mismatched = closest
+        if mismatched:
+            reason = (
+                f"closest route {route!r} does not match its {', '.join(mismatched)}"
+            )
+        elif route in self._scenario_routes:
+            scenario, state = self._scenario_routes[route]
+            reason = (
+                f"route {route!r} matches but only in state {state!r} "
+                f"of scenario {scenario.name!r}"
             )
+        elif seq >= unmatched.routes_added:
+            reason = f"route {route!r} matches but was added after the request"
+        else:
+            reason = f"route {route!r} matches but had already been used up"
+        return RouteDiagnosis(request, route, mismatched, reason)
 
     def assert_plan_strictly_followed(self):
         self.assert_no_unused_routes()
@@ -335,6 +1130,92 @@ class ResponsesMockServer(BaseTestServer):
     def history(self) -> List[RoutingLog]:
         return self._history
 
+    @property
+    def history_times(self):
+        """When each `history` entry arrived, in `time.monotonic()` seconds"""
+        self._sync_history_index()
+        return self._history_index.times
+
+    def clear_history(self):
+        self._history.clear()
+        self._history_index.clear()
+
+    def calls_for(
+        self, route=None, *, host=None, method=None, path=None, since=None, until=None
+    ) -> List[RoutingLog]:
+        """
+        The history entries of requests matching every given filter, in order
+
+        Looked up in indexes kept as requests arrive, so the cost depends on
+        the number of entries returned, not on the length of the history.
+
+        :param route: a route returned by `add`
+        :param host: the request's host
+        :param method: the request's method
+        :param path: the request's path, without the query string
+        :param since: only requests that arrived at or after this
+            `time.monotonic()` time
+        :param until: only requests that arrived before this time
+        """
+        positions = self._call_positions(route, host, method, path, since, until)
+        history = self._history
+        return [history[position] for position in positions]
+
+    def call_count(
+        self, route=None, *, host=None, method=None, path=None, since=None, until=None
+    ):
+        """The number of requests `calls_for` would return"""
+        if since is None and until is None:
+            self._check_history_index()
+            return self._history_index.count(route, host, method, path)
+        return len(self._call_positions(route, host, method, path, since, until))
+
+    def assert_called(self, route=None, times=None, **filters):
+        """
+        Assert that requests matching `route` and `filters` were made
+
+        :param times: the exact number of calls, by default at least one
+        :param filters: any keyword argument of `calls_for`
+        """
+        count = self.call_count(route, **filters)
+        if count == times or (times is None and count):
+            return
+        described = [repr(route)] if route is not None else []
+        described += [f"{name}={value!r}" for name, value in filters.items()]
+        expected = "at least once" if times is None else f"{times} times"
+        raise UnexpectedCallCountError(
+            f"Expected {' '.join(described) or 'requests'} to be called "
+            f"{expected}, but was called {count} times"
+        )
+
+    def _sync_history_index(self):
+        """
+        Reset the history index if `history` was emptied directly
+
+        `history.clear()` was the way to forget requests before
+        `clear_history` existed.
+        """
+        if not self._history and self._history_index.times:
+            self._history_index.clear()
+
+    def _check_history_index(self):
+        self._sync_history_index()
+        if len(self._history) != len(self._history_index.times):
+            raise RuntimeError(
+                "history was modified directly, so calls can no longer be "
+                "looked up; use clear_history() to forget past requests"
+            )
+
+    def _call_positions(self, route, host, method, path, since, until):
+        self._check_history_index()
+        index = self._history_index
+        positions = index.positions(route, host, method, path)
+        if positions is None:
+            return index.window(since, until)
+        if since is None and until is None:
+            return positions
+        return [p for p in positions if index.in_window(p, since, until)]
+
 
 @asyncio_fixture()
 async def aresponses() -> ResponsesMockServer:
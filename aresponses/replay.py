@@ -0,0 +1,217 @@
+"""
+Turn recorded history into a repeatable load test
+
+`history_requests` captures the requests a `ResponsesMockServer` received,
+`save_requests`/`load_requests` store them as JSON lines and `replay`
+reissues them concurrently, reporting throughput and latency percentiles.
+"""
+
+import asyncio
+import base64
+import json
+import math
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+import aiohttp
+from yarl import URL
+
+# headers that are recomputed when a request is sent again
+_SKIPPED_HEADERS = {
+    "host",
+    "content-length",
+    "transfer-encoding",
+    "connection",
+    "aresponsesisssl",
+}
+
+
+class ReplayRequest(NamedTuple):
+    # seconds since the first recorded request
+    offset: float
+    method: str
+    url: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+class ReplayReport(NamedTuple):
+    requests: int
+    errors: int
+    elapsed: float
+    statuses: Counter
+    latencies: List[float]
+
+    @property
+    def throughput(self):
+        """Completed requests per second"""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        """Latency in seconds below which `percent` of the requests completed"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def __str__(self):
+        lines = [
+            f"requests: {self.requests} ({self.errors} errors) "
+            f"in {self.elapsed:.2f}s, {self.throughput:.1f} req/s"
+        ]
+        if self.latencies:
+            lines.append(
+                "latency: "
+                + ", ".join(
+                    f"p{p}={self.percentile(p) * 1000:.2f}ms" for p in (50, 90, 99)
+                )
+                + f", max={max(self.latencies) * 1000:.2f}ms"
+            )
+        lines.append(
+            "statuses: "
+            + ", ".join(f"{status}={n}" for status, n in sorted(self.statuses.items()))
+        )
+        return "\n".join(lines)
+
+
+async def history_requests(server):
+    """Capture the requests received by `server` as ReplayRequests"""
+    requests = []
+    start = server.history_times[0] if server.history_times else 0.0
+    for log, arrived in zip(server.history, server.history_times):
+        request = log.request
+        scheme = "https" if request.headers.get("AResponsesIsSSL") else "http"
+        url = request.url.with_scheme(scheme)
+        requests.append(
+            ReplayRequest(
+                offset=arrived - start,
+                method=request.method,
+                url=str(url),
+                headers={
+                    k: v
+                    for k, v in request.headers.items()
+                    if k.lower() not in _SKIPPED_HEADERS
+                },
+                body=await request.read(),
+            )
+        )
+    return requests
+
+
+def save_requests(requests, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            entry = request._asdict()
+            entry["body"] = base64.b64encode(request.body).decode("ascii")
+            f.write(json.dumps(entry) + "\n")
+
+
+def load_requests(path):
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entry["body"] = base64.b64decode(entry["body"])
+                requests.append(ReplayRequest(**entry))
+    return requests
+
+
+def _schedule(requests, rate_multiplier, duration):
+    """Yield (due, request) with `due` in seconds from the start of the replay"""
+    span = requests[-1].offset if requests else 0.0
+    # leave the average gap between passes when looping
+    period = span + (span / max(len(requests) - 1, 1) if span else 0.0)
+    base = 0.0
+    while True:
+        for request in requests:
+            due = (base + request.offset) / rate_multiplier if rate_multiplier else 0.0
+            yield due, request
+        if duration is None:
+            return
+        base += period
+
+
+async def replay(
+    requests,
+    *,
+    target=None,
+    concurrency=10,
+    rate_multiplier=None,
+    duration=None,
+    session=None,
+):
+    """
+    Send `requests` again and measure how the server copes
+
+    :param target: base URL (e.g. of a standalone server) to send every
+        request to instead of its recorded URL; the recorded host is kept in
+        the `Host` header
+    :param concurrency: maximum requests in flight
+    :param rate_multiplier: replay at the recorded pace sped up by this
+        factor; None sends requests as fast as `concurrency` allows
+    :param duration: keep looping over `requests` for this many seconds;
+        None replays them once
+    :param session: aiohttp session to use, by default a pooled session
+        limited to `concurrency` connections
+    """
+    if not requests:
+        return ReplayReport(0, 0, 0.0, Counter(), [])
+    target = URL(target) if target is not None else None
+    schedule = _schedule(requests, rate_multiplier, duration)
+    statuses = Counter()
+    latencies = []
+    errors = 0
+
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency)
+        )
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + duration if duration is not None else math.inf
+
+    async def worker():
+        nonlocal errors
+        for due, request in schedule:
+            now = loop.time()
+            if start + due >= deadline or now >= deadline:
+                return
+            if start + due > now:
+                await asyncio.sleep(start + due - now)
+
+            url = URL(request.url)
+            headers = dict(request.headers)
+            if target is not None:
+                headers["Host"] = (
+                    url.host if url.is_default_port() else f"{url.host}:{url.port}"
+                )
+                url = target.join(URL(url.raw_path_qs, encoded=True))
+            sent = time.perf_counter()
+            try:
+                async with session.request(
+                    request.method, url, headers=headers, data=request.body or None
+                ) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+            latencies.append(time.perf_counter() - sent)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if own_session:
+            await session.close()
+
+    return ReplayReport(
+        requests=len(latencies),
+        errors=errors,
+        elapsed=loop.time() - start,
+        statuses=statuses,
+        latencies=latencies,
+    )
@@ -0,0 +1,250 @@
+"""
+Run a routing table behind a real listening socket
+
+Unlike `ResponsesMockServer` used as a context manager, nothing in aiohttp
+is patched: any HTTP client, in any process, talks to the server directly.
+Requests are matched on their `Host` header, optionally rewritten with a
+host map, e.g. `{"localhost:8080": "api.example.com"}`.
+
+Routes are read from a JSON file::
+
+    {
+        "host_map": {"localhost:8080": "api.example.com"},
+        "unmatched": {"status": 404, "body": "no route"},
+        "routes": [
+            {
+                "host": "api.example.com",
+                "path": {"regex": "^/v1/users/\\\\d+$"},
+                "method": "get",
+                "response": {"status": 200, "json": {"name": "foo"}},
+                "repeat": null
+            }
+        ]
+    }
+
+Patterns (`host`, `path`, `method`, `body`) are exact strings, or regular
+expressions when given as `{"regex": ...}`, and match anything when left
+out.  `headers` and `query` map header and query parameter names to such
+patterns.  `response` is a string or an object with `status`, `headers`, `body`
+or `json`, and `delay` in seconds.  `repeat` defaults to 1 and `null`
+repeats forever.  `faults` and `limit` take the keyword arguments of
+`FaultProfile` and `RateLimit`.  `compress` is true or a list of encodings
+to pre-compress a response without a `delay` with.
+
+Stateful flows go under `scenarios`, mapping each scenario name to its
+`initial_state` (default `"start"`) and `states`, the route entries of
+each state; an entry's `next_state` moves the scenario on::
+
+    "scenarios": {
+        "login": {
+            "states": {
+                "start": [{"path": "/login", "response": "token",
+                           "next_state": "authenticated"}],
+                "authenticated": [{"path": "/items", "response": "[]"}]
+            }
+        }
+    }
+
+History, metrics and assertion results are served as JSON under
+`/__aresponses__/` (`history`, `metrics`, `assertions`).
+"""
+
+import asyncio
+import json
+import math
+import re
+from copy import copy
+
+from aiohttp import web
+from aiohttp.web_response import json_response
+
+from aresponses.errors import AresponsesAssertionError
+from aresponses.faults import FaultProfile
+from aresponses.limits import RateLimit
+from aresponses.main import ResponsesMockServer
+from aresponses.utils import ANY
+
+CONTROL_PREFIX = "/__aresponses__/"
+
+
+class StandaloneServer(ResponsesMockServer):
+    def __init__(self, *, host_map=None, scheme="http", compact_history=True, **kwargs):
+        # a long running server keeps its history for the whole run
+        super().__init__(scheme=scheme, compact_history=compact_history, **kwargs)
+        self.host_map = {k.lower(): v.lower() for k, v in (host_map or {}).items()}
+        self._limits = []
+        self._fault_profiles = []
+        self.set_unmatched_response("No route matched", status=404)
+
+    async def _handler(self, request):
+        if request.path.startswith(CONTROL_PREFIX):
+            return await self._control(request)
+
+        mapped_host = self.host_map.get(request.host.lower())
+        if mapped_host is not None:
+            request = request.clone(host=mapped_host)
+        return await super()._handler(request)
+
+    async def _control(self, request):
+        endpoint = request.path[len(CONTROL_PREFIX) :]
+        if endpoint == "history":
+            return json_response([_history_entry(log) for log in self.history])
+        if endpoint == "metrics":
+            return json_response(self.metrics())
+        if endpoint == "assertions":
+            return json_response(self.assertion_results())
+        return web.Response(status=404, text=f"Unknown endpoint: {request.path}")
+
+    def add_route_spec(self, spec, scenario=None, state=None):
+        """Add a route described by an entry of a route file"""
+        spec = dict(spec)
+        faults = spec.pop("faults", None)
+        limit = spec.pop("limit", None)
+        repeat = spec.pop("repeat", 1)
+        if faults is not None:
+            faults = FaultProfile(**faults)
+            self._fault_profiles.append(faults)
+        if limit is not None:
+            limit = RateLimit(**limit)
+            self._limits.append(limit)
+        self.add(
+            host_pattern=_pattern(spec.pop("host", None)),
+            path_pattern=_pattern(spec.pop("path", None)),
+            method_pattern=_pattern(spec.pop("method", None)),
+            response=_response(spec.pop("response", "")),
+            body_pattern=_pattern(spec.pop("body", None)),
+            match_querystring=spec.pop("match_querystring", False),
+            headers=_patterns(spec.pop("headers", None)),
+            query=_patterns(spec.pop("query", None)),
+            repeat=math.inf if repeat is None else repeat,
+            faults=faults,
+            limit=limit,
+            compress=spec.pop("compress", None),
+            scenario=scenario,
+            state=state,
+            next_state=spec.pop("next_state", None) if scenario else None,
+        )
+        if spec:
+            raise ValueError(f"Unknown route options: {', '.join(sorted(spec))}")
+
+    def load_spec(self, spec):
+        """Configure the server from the contents of a route file"""
+        self.host_map.update(
+            {k.lower(): v.lower() for k, v in spec.get("host_map", {}).items()}
+        )
+        unmatched = spec.get("unmatched")
+        if unmatched == "reset":
+            self.reset_on_unmatched()
+        elif unmatched is not None:
+            self.set_unmatched_response(
+                unmatched.get("body", ""),
+                status=unmatched.get("status", 404),
+                delay=unmatched.get("delay", 0),
+            )
+        for route_spec in spec.get("routes", []):
+            self.add_route_spec(route_spec)
+        for name, scenario_spec in spec.get("scenarios", {}).items():
+            scenario = self.Scenario(name, scenario_spec.get("initial_state", "start"))
+            for state, route_specs in scenario_spec["states"].items():
+                for route_spec in route_specs:
+                    self.add_route_spec(route_spec, scenario, state)
+
+    def metrics(self):
+        return {
+            "requests": self._request_count,
+            "matched": self._matched_count,
+            "unmatched": len(self._unmatched_requests),
+            "routes_remaining": len(self._responses),
+            "limits": [limit.stats for limit in self._limits],
+            "faults": [dict(profile.injected) for profile in self._fault_profiles],
+            "scenarios": {
+                scenario.name: {"state": scenario.state, "visited": scenario.visited}
+                for scenario in self._scenarios
+            },
+        }
+
+    def assertion_results(self):
+        results = {}
+        for name, kwargs in (
+            # routes with `"repeat": null` are never used up
+            ("assert_no_unused_routes", {"ignore_infinite_repeats": True}),
+            ("assert_called_in_order", {}),
+            ("assert_all_requests_matched", {}),
+        ):
+            try:
+                getattr(self, name)(**kwargs)
+            except AresponsesAssertionError as e:
+                results[name] = str(e)
+            else:
+                results[name] = None
+        return {
+            "passed": all(error is None for error in results.values()),
+            "errors": results,
+        }
+
+
+def _pattern(spec):
+    if spec is None:
+        return ANY
+    if isinstance(spec, dict):
+        return re.compile(spec["regex"])
+    return spec
+
+
+def _patterns(spec):
+    if spec is None:
+        return None
+    return {name: _pattern(value) for name, value in spec.items()}
+
+
+def _response(spec):
+    if isinstance(spec, str):
+        return spec
+    spec = dict(spec)
+    delay = spec.pop("delay", 0)
+    kwargs = {"status": spec.pop("status", 200), "headers": spec.pop("headers", None)}
+    if "json" in spec:
+        response = json_response(spec.pop("json"), **kwargs)
+    else:
+        response = web.Response(text=spec.pop("body", ""), **kwargs)
+    if spec:
+        raise ValueError(f"Unknown response options: {', '.join(sorted(spec))}")
+    if not delay:
+        return response
+
+    async def delayed(request):
+        await asyncio.sleep(delay)
+        return copy(response)
+
+    return delayed
+
+
+def _history_entry(log):
+    request = log.request
+    return {
+        "method": request.method,
+        "host": request.host,
+        "path": request.path_qs,
+        "matched": log.route is not None,
+        "route": repr(log.route) if log.route is not None else None,
+        "status": getattr(log.response, "status", None),
+    }
+
+
+def load_route_file(path, **kwargs):
+    """Create a `StandaloneServer` configured by the route file at `path`"""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    server = StandaloneServer(**kwargs)
+    server.load_spec(spec)
+    return server
+
+
+async def serve(server):
+    """Run `server` until cancelled"""
+    await server.start_server()
+    print(f"aresponses serving on {server.make_url('/')}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
@@ -0,0 +1,253 @@
+"""
+In-process transport for `ResponsesMockServer(in_memory=True)`
+
+Client requests are turned straight into server side requests and the
+mock server's response straight into a client response, without sockets
+and without serializing or parsing HTTP.
+"""
+
+import asyncio
+import inspect
+
+from aiohttp import ClientPayloadError, ServerDisconnectedError, web
+from aiohttp.client_reqrep import ClientResponse
+from aiohttp.http import HttpVersion11
+from aiohttp.http_parser import RawRequestMessage, RawResponseMessage
+from aiohttp.streams import StreamReader
+from aiohttp.web_request import BaseRequest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from aresponses.compression import DECODERS
+from aresponses.faults import PartialResponse
+
+_READ_LIMIT = 2**16
+_CLIENT_RESPONSE_PARAMS = inspect.signature(ClientResponse.__init__).parameters
+
+
+class _MemoryTransport:
+    def __init__(self):
+        self.aborted = False
+        self.closed = False
+
+    def abort(self):
+        self.aborted = True
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.aborted or self.closed
+
+    def write(self, data):
+        pass
+
+    def get_extra_info(self, name, default=None):
+        if name in ("peername", "sockname"):
+            return _MemoryProtocol.peername
+        return default
+
+
+class _MemoryProtocol:
+    """Just enough of aiohttp's client and server protocols for one request"""
+
+    connected = True
+    upgraded = False
+    should_close = True
+    ssl_context = None
+    peername = ("127.0.0.1", 0)
+    sockname = ("127.0.0.1", 0)
+    max_field_size = 8190
+    max_headers = 32768
+    _reading_paused = False
+
+    def __init__(self):
+        self.transport = _MemoryTransport()
+        self.response_message = None
+        self.auto_decompress = True
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self, *_, **__):
+        pass
+
+    def set_response_params(self, *, auto_decompress=True, **_):
+        self.auto_decompress = auto_decompress
+
+    def is_connected(self):
+        return not self.transport.is_closing()
+
+    def close(self):
+        self.transport.close()
+
+    async def read(self):
+        return self.response_message
+
+
+class MemoryConnection:
+    """Stands in for the connection a connector would hand to the client"""
+
+    def __init__(self):
+        self.protocol = _MemoryProtocol()
+        self.closed = False
+        self._callbacks = []
+
+    @property
+    def transport(self):
+        return self.protocol.transport
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def release(self):
+        self.close()
+
+    def close(self):
+        self.closed = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class _NoOutput:
+    output_size = 0
+
+
+class _Collector:
+    """Writer that keeps whatever a payload writes to it"""
+
+    def __init__(self):
+        self.chunks = []
+
+    async def write(self, chunk):
+        self.chunks.append(bytes(chunk))
+
+    async def drain(self):
+        pass
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+async def _payload_bytes(payload):
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    collector = _Collector()
+    await payload.write(collector)
+    return collector.getvalue()
+
+
+def _stream(protocol, loop, data):
+    stream = StreamReader(protocol, _READ_LIMIT, loop=loop)
+    if data:
+        stream.feed_data(data)
+    return stream
+
+
+async def send(server, client_request, connection):
+    """Handle `client_request` with `server` and return the client response"""
+    loop = client_request.loop
+    protocol = connection.protocol
+
+    body = await _payload_bytes(client_request.body)
+    headers = CIMultiDict(client_request.headers)
+    # what `ResponsesMockServer` adds to requests sent over a socket
+    headers["AResponsesIsSSL"] = (
+        "1" if client_request._aresponses_direct_is_ssl() else ""
+    )
+    headers = CIMultiDictProxy(headers)
+    path = client_request.url.raw_path_qs
+    message = RawRequestMessage(
+        client_request.method,
+        path,
+        client_request.version,
+        headers,
+        tuple((k.encode(), v.encode()) for k, v in headers.items()),
+        False,
+        None,
+        False,
+        False,
+        URL(path, encoded=True),
+    )
+    payload = _stream(protocol, loop, body)
+    payload.feed_eof()
+    request = BaseRequest(
+        message, payload, protocol, None, asyncio.current_task(), loop
+    )
+
+    response = await server._handler(request)
+    if protocol.transport.aborted:
+        raise ServerDisconnectedError()
+    protocol.response_message = await _response_message(
+        response, protocol, loop, client_request.method
+    )
+
+    kwargs = dict(
+        writer=None,
+        continue100=None,
+        timer=client_request._timer,
+        request_info=client_request.request_info,
+        traces=client_request._traces,
+        loop=loop,
+        session=client_request._session,
+    )
+    if "stream_writer" in _CLIENT_RESPONSE_PARAMS:
+        kwargs["stream_writer"] = _NoOutput()
+    client_request.response = client_request.response_class(
+        client_request.method, client_request.original_url, **kwargs
+    )
+    return client_request.response
+
+
+async def _response_message(response, protocol, loop, method):
+    if response is None:
+        # what aiohttp's server sends when a handler returns nothing
+        response = web.Response(status=500, text="500 Internal Server Error")
+
+    if isinstance(response, PartialResponse):
+        body = response._partial_body
+        complete = False
+    elif isinstance(response, web.Response):
+        body = await _payload_bytes(response.body)
+        complete = True
+    else:
+        raise NotImplementedError(
+            f"{type(response).__name__} can only be sent by the socket transport"
+        )
+
+    headers = CIMultiDict(response.headers)
+    for cookie in response.cookies.values():
+        headers.add("Set-Cookie", cookie.output(header="")[1:])
+    if complete:
+        headers.setdefault("Content-Length", str(len(body)))
+        if body:
+            headers.setdefault("Content-Type", "application/octet-stream")
+
+    # the socket transport's parser decompresses bodies for the client
+    decode = DECODERS.get(headers.get("Content-Encoding", "").lower())
+    if decode is not None and protocol.auto_decompress and complete and body:
+        body = decode(body)
+
+    payload = _stream(protocol, loop, b"" if method == "HEAD" else body)
+    if complete or method == "HEAD":
+        payload.feed_eof()
+    else:
+        payload.set_exception(ClientPayloadError("Response payload is not completed"))
+
+    return (
+        RawResponseMessage(
+            HttpVersion11,
+            response.status,
+            response.reason,
+            CIMultiDictProxy(headers),
+            tuple((k.encode(), v.encode()) for k, v in headers.items()),
+            True,
+            None,
+            False,
+            False,
+        ),
+        payload,
+    )
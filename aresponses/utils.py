@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 ANY = re.compile(".*")
 
@@ -16,3 +17,51 @@ def _text_matches_pattern(pattern, text):
         if pattern.search(text):
             return True
     return False
+
+
+def _always(text):
+    return True
+
+
+def _never(text):
+    return False
+
+
+class _Equals:
+    """
+    Match text equal to a literal pattern
+
+    Smaller than a closure or a `functools.partial`, and unlike
+    `pattern.__eq__` it doesn't return the truthy NotImplemented for
+    anything but a str.
+    """
+
+    __slots__ = ("pattern",)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def __call__(self, text):
+        return text == self.pattern
+
+
+@lru_cache(maxsize=1024)
+def _equals(pattern):
+    # shared by the routes for the same host, method or path
+    return _Equals(pattern)
+
+
+def _compile_pattern(pattern):
+    """
+    Return a predicate equivalent to `_text_matches_pattern(pattern, text)`.
+
+    The pattern type is inspected once instead of on every call.
+    """
+    if pattern is ANY:
+        return _always
+    if isinstance(pattern, str):
+        return _equals(pattern)
+    if isinstance(pattern, type(ANY)):
+        search = pattern.search
+        return lambda text: search(text) is not None
+    return _never
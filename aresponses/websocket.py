@@ -0,0 +1,268 @@
+import asyncio
+import json
+import math
+from collections import deque
+
+from aiohttp import WSMsgType, web
+
+# a script step that waits for the next message from the client
+RECEIVE = object()
+
+# frames sent between checks of the deadline and the connection state when
+# broadcasting as fast as possible
+_UNPACED_BATCH = 256
+
+
+def _frame(data):
+    """Encode a frame once as (is_text, data, size in bytes)"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+        return False, data, len(data)
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    return True, data, len(data.encode("utf-8"))
+
+
+class WebSocketStats:
+    """Frame and byte counters of one connection"""
+
+    __slots__ = (
+        "frames_sent",
+        "bytes_sent",
+        "frames_received",
+        "bytes_received",
+        "received",
+        "max_lag",
+        "closed",
+    )
+
+    def __init__(self, keep_received=False):
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_received = 0
+        self.bytes_received = 0
+        # client messages, the last `keep_received` of them when it's a number
+        if keep_received is True:
+            self.received = []
+        else:
+            self.received = deque(maxlen=keep_received or 0)
+        # how far, in seconds, a rate driven broadcast fell behind schedule
+        self.max_lag = 0.0
+        self.closed = False
+
+    def as_dict(self):
+        return {
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "frames_received": self.frames_received,
+            "bytes_received": self.bytes_received,
+            "max_lag": self.max_lag,
+            "closed": self.closed,
+        }
+
+    def __repr__(self):
+        return f"WebSocketStats({self.as_dict()!r})"
+
+
+class WebSocket:
+    """
+    Respond to a WebSocket upgrade and stream frames to the client
+
+    The server sends `script`, then the frames of `frames`, then the
+    `broadcast` frames, and closes the connection; with `echo=True` it then
+    echoes client messages until the client closes instead.
+
+    Frames are str (text), bytes (binary) or anything else, sent as JSON.
+    Every send waits for the client to drain the socket once the write
+    buffer is full, so a slow consumer slows the stream down rather than
+    growing the buffer; `max_lag` records how far a broadcast fell behind.
+
+    :param script: frames to send first; `RECEIVE` steps wait for a client
+        message
+    :param frames: an async iterable of frames, or a function taking the
+        request and returning one (e.g. an async generator function)
+    :param echo: send every client message back, until the client closes
+    :param broadcast: a frame, or a function of the frame number returning
+        one, sent `rate` times per second
+    :param rate: frames per second of `broadcast`; None sends them as fast
+        as the client reads them
+    :param count: number of `broadcast` frames, None for no limit
+    :param duration: seconds to keep broadcasting, None for no limit
+    :param keep_received: keep client messages in `WebSocketStats.received`:
+        True keeps all of them, a number only the last ones
+    :param protocols: subprotocols the server accepts
+    :param compress: allow per-message deflate
+    """
+
+    RECEIVE = RECEIVE
+
+    def __init__(
+        self,
+        script=(),
+        *,
+        frames=None,
+        echo=False,
+        broadcast=None,
+        rate=None,
+        count=None,
+        duration=None,
+        keep_received=False,
+        protocols=(),
+        compress=False,
+    ):
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        if broadcast is None and (rate, count, duration) != (None, None, None):
+            raise ValueError("rate, count and duration need a broadcast frame")
+        self._script = [step if step is RECEIVE else _frame(step) for step in script]
+        self.frames = frames
+        self.echo = echo
+        self.broadcast = broadcast
+        self._broadcast_frame = (
+            None if broadcast is None or callable(broadcast) else _frame(broadcast)
+        )
+        self.rate = rate
+        self.count = count
+        self.duration = duration
+        self.keep_received = keep_received
+        self.protocols = tuple(protocols)
+        self.compress = compress
+        self.connections = []
+
+    @property
+    def stats(self):
+        """Counters summed over every connection"""
+        totals = {
+            "connections": len(self.connections),
+            "frames_sent": 0,
+            "bytes_sent": 0,
+            "frames_received": 0,
+            "bytes_received": 0,
+        }
+        for connection in self.connections:
+            totals["frames_sent"] += connection.frames_sent
+            totals["bytes_sent"] += connection.bytes_sent
+            totals["frames_received"] += connection.frames_received
+            totals["bytes_received"] += connection.bytes_received
+        return totals
+
+    async def handle(self, request):
+        if getattr(request, "_payload_writer", None) is None:
+            raise NotImplementedError(
+                "WebSocket routes can only be served by the socket transport"
+            )
+        ws = web.WebSocketResponse(protocols=self.protocols, compress=self.compress)
+        await ws.prepare(request)
+        stats = WebSocketStats(self.keep_received)
+        self.connections.append(stats)
+        inbox = asyncio.Queue() if RECEIVE in self._script else None
+
+        sender = asyncio.ensure_future(self._send_all(ws, request, stats, inbox))
+        receiver = asyncio.ensure_future(self._receive_all(ws, stats, inbox))
+        try:
+            if not self.echo:
+                await asyncio.wait(
+                    (sender, receiver), return_when=asyncio.FIRST_COMPLETED
+                )
+                if sender.done():
+                    sender.result()
+                    await ws.close()
+            await receiver
+        finally:
+            # aiohttp cancels the handler once the connection is closed, so
+            # nothing is awaited from here on
+            stats.closed = True
+            for task in (sender, receiver):
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+        return ws
+
+    async def _receive_all(self, ws, stats, inbox):
+        async for message in ws:
+            if message.type == WSMsgType.TEXT:
+                size = len(message.data.encode("utf-8"))
+            elif message.type == WSMsgType.BINARY:
+                size = len(message.data)
+            else:
+                continue
+            stats.frames_received += 1
+            stats.bytes_received += size
+            if self.keep_received:
+                stats.received.append(message.data)
+            if inbox is not None:
+                inbox.put_nowait(message.data)
+            if self.echo:
+                is_text = message.type == WSMsgType.TEXT
+                await _send(ws, stats, (is_text, message.data, size))
+
+    async def _send_all(self, ws, request, stats, inbox):
+        try:
+            await self._stream(ws, request, stats, inbox)
+        except ConnectionResetError:
+            # the client went away mid stream
+            pass
+
+    async def _stream(self, ws, request, stats, inbox):
+        for step in self._script:
+            if step is RECEIVE:
+                await inbox.get()
+            else:
+                await _send(ws, stats, step)
+
+        if self.frames is not None:
+            frames = self.frames(request) if callable(self.frames) else self.frames
+            async for data in frames:
+                await _send(ws, stats, _frame(data))
+
+        if self.broadcast is not None:
+            await self._broadcast(ws, stats)
+
+    async def _broadcast(self, ws, stats):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        count = self.count if self.count is not None else math.inf
+        deadline = start + self.duration if self.duration is not None else math.inf
+        frame = self._broadcast_frame
+        sent = 0
+        while sent < count and not ws.closed:
+            now = loop.time()
+            if now >= deadline:
+                break
+            if self.rate is None:
+                due = min(count, sent + _UNPACED_BATCH)
+            else:
+                # every frame that is due by now, so a high rate is sent in
+                # batches rather than sleeping between frames
+                due = min(count, math.floor((now - start) * self.rate) + 1)
+                stats.max_lag = max(stats.max_lag, now - start - sent / self.rate)
+            while sent < due and not ws.closed:
+                await _send(
+                    ws,
+                    stats,
+                    frame if frame is not None else _frame(self.broadcast(sent)),
+                )
+                sent += 1
+            # sends only yield to the loop once the write buffer is full, so
+            # sleep between batches to let the connection receive and close
+            if self.rate is None or sent >= count:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(max(0.0, start + sent / self.rate - loop.time()))
+
+    def __repr__(self):
+        return (
+            f"WebSocket(script={len(self._script)} steps, echo={self.echo!r}, "
+            f"rate={self.rate!r}, count={self.count!r})"
+        )
+
+
+async def _send(ws, stats, frame):
+    is_text, data, size = frame
+    if is_text:
+        await ws.send_str(data)
+    else:
+        await ws.send_bytes(data)
+    stats.frames_sent += 1
+    stats.bytes_sent += size
@@ -0,0 +1,74 @@
+"""
+Measure the memory held by the routing table and the request history
+
+    python benchmarks/memory.py [--routes N] [--requests N]
+
+Prints the bytes retained per route and per history entry, as seen by
+`tracemalloc`, with and without `compact_history`.
+
+Compare against the release before the routing and history changes, not
+against an intermediate commit: there, adding the same 20k routes retained
+about 580 bytes per route (Python 3.11), and history entries over the
+socket transport about 3800 bytes.
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+
+import aiohttp
+
+from aresponses import ResponsesMockServer
+
+
+def _retained(before):
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] - before
+
+
+def _current():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+async def measure_routes(count):
+    async with ResponsesMockServer(in_memory=True) as server:
+        before = _current()
+        for i in range(count):
+            server.add(f"host{i % 100}.com", f"/items/{i}", "get", {"id": i})
+        return _retained(before) / count
+
+
+async def measure_history(count, **kwargs):
+    # over the socket transport, as the release before the changes had no other
+    async with ResponsesMockServer(**kwargs) as server:
+        server.add("foo.com", response="ok", repeat=server.INFINITY)
+        async with aiohttp.ClientSession() as session:
+            # warm up aiohttp's caches so they aren't counted
+            async with session.get("http://foo.com/warmup") as response:
+                await response.read()
+            server.clear_history()
+            before = _current()
+            for i in range(count):
+                async with session.get(
+                    f"http://foo.com/items/{i}?page=1", headers={"X-Request": str(i)}
+                ) as response:
+                    await response.read()
+            return _retained(before) / count
+
+
+async def main(routes, requests):
+    tracemalloc.start()
+    print(f"routes:  {await measure_routes(routes):8.0f} bytes per route")
+    print(f"history: {await measure_history(requests):8.0f} bytes per entry")
+    compact = await measure_history(requests, compact_history=True)
+    print(f"history: {compact:8.0f} bytes per entry (compact_history=True)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.routes, args.requests))
@@ -0,0 +1,76 @@
+import gzip
+import zlib
+
+import aiohttp
+import pytest
+
+from aresponses.compression import CompressedBody, available_encodings
+
+
+def test_negotiate():
+    body = CompressedBody(b"hello" * 100, ["gzip", "deflate"])
+    assert body.negotiate(None) == (None, b"hello" * 100)
+    assert body.negotiate("gzip, deflate")[0] == "gzip"
+    assert body.negotiate("deflate, gzip;q=0.5")[0] == "deflate"
+    assert body.negotiate("br")[0] is None
+    assert body.negotiate("*;q=0.1, gzip;q=0")[0] == "deflate"
+    assert gzip.decompress(body.variants["gzip"]) == b"hello" * 100
+    assert zlib.decompress(body.variants["deflate"]) == b"hello" * 100
+
+    with pytest.raises(ValueError):
+        available_encodings(["compress"])
+
+
+@pytest.mark.asyncio
+async def test_compressed_responses(aresponses):
+    aresponses.add(
+        "foo.com",
+        "/json",
+        "get",
+        {"items": list(range(100))},
+        compress=True,
+        repeat=3,
+    )
+    aresponses.add(
+        "foo.com",
+        "/text",
+        "get",
+        aresponses.Response(text="x" * 1000, status=202, headers={"X-Foo": "1"}),
+        compress=["deflate"],
+    )
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/json") as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert response.headers["Vary"] == "Accept-Encoding"
+            assert await response.json() == {"items": list(range(100))}
+
+        async with session.get(
+            "http://foo.com/json", headers={"Accept-Encoding": "identity"}
+        ) as response:
+            assert "Content-Encoding" not in response.headers
+            assert await response.json() == {"items": list(range(100))}
+
+        async with session.get("http://foo.com/text") as response:
+            assert response.status == 202
+            assert response.headers["Content-Encoding"] == "deflate"
+            assert response.headers["X-Foo"] == "1"
+            assert await response.text() == "x" * 1000
+
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        async with session.get("http://foo.com/json") as response:
+            raw = await response.read()
+    assert int(response.headers["Content-Length"]) == len(raw)
+    assert (
+        gzip.decompress(raw)
+        == b'{"items": [' + b", ".join(str(i).encode() for i in range(100)) + b"]}"
+    )
+
+    aresponses.assert_no_unused_routes()
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_compress_needs_a_static_body(aresponses):
+    with pytest.raises(ValueError):
+        aresponses.add("foo.com", response=lambda request: None, compress=True)
@@ -0,0 +1,79 @@
+import aiohttp
+import pytest
+
+from aresponses import FaultProfile
+
+
+def test_fault_profile_is_deterministic_for_a_seed():
+    def draws(seed):
+        profile = FaultProfile(error_rate=0.2, reset_rate=0.1, drop_rate=0.1, seed=seed)
+        return [profile.choose() for _ in range(200)]
+
+    assert draws(1) == draws(1)
+    assert draws(1) != draws(2)
+    counts = FaultProfile(error_rate=0.25, seed=3)
+    faults = [counts.choose() for _ in range(10000)]
+    assert 2000 < faults.count("error") < 3000
+    assert counts.injected["error"] == faults.count("error")
+
+
+def test_fault_profile_rates_are_validated():
+    with pytest.raises(ValueError):
+        FaultProfile(error_rate=0.6, drop_rate=0.6)
+    with pytest.raises(ValueError):
+        FaultProfile(reset_rate=-0.1)
+
+
+@pytest.mark.asyncio
+async def test_error_fault(aresponses):
+    profile = aresponses.FaultProfile(error_rate=1, error_statuses=[503])
+    aresponses.add("foo.com", "/", "get", "hi", faults=profile)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/") as response:
+            assert response.status == 503
+
+    assert profile.injected == {"error": 1}
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fault", ["reset_rate", "truncate_rate"])
+async def test_partial_body_faults(aresponses, fault):
+    profile = aresponses.FaultProfile(**{fault: 1})
+    aresponses.add("foo.com", "/", "post", "x" * 100_000, faults=profile)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post("http://foo.com/") as response:
+            assert response.status == 200
+            with pytest.raises(aiohttp.ClientPayloadError):
+                await response.read()
+
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_drop_fault(aresponses):
+    profile = aresponses.FaultProfile(drop_rate=1)
+    aresponses.add("foo.com", "/", "post", "hi", faults=profile)
+
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            async with session.post("http://foo.com/"):
+                pass
+
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_slow_headers_fault(aresponses):
+    profile = aresponses.FaultProfile(slow_headers_rate=1, slow_headers_delay=0.2)
+    aresponses.add("foo.com", "/", "get", "hi", faults=profile)
+
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(aiohttp.ServerTimeoutError):
+            timeout = aiohttp.ClientTimeout(sock_read=0.05)
+            async with session.get("http://foo.com/", timeout=timeout):
+                pass
+
+    aresponses.assert_plan_strictly_followed()
@@ -0,0 +1,102 @@
+import time
+
+import aiohttp
+import pytest
+
+from aresponses.errors import UnexpectedCallCountError
+from aresponses.history import HistoryIndex
+
+
+@pytest.mark.asyncio
+async def test_calls_for(aresponses):
+    users = aresponses.add("api.foo.com", "/users", "get", [], repeat=3)
+    create = aresponses.add("api.foo.com", "/users", "post", {"id": 1})
+    other = aresponses.add("other.com", response="hi", repeat=2)
+    unused = aresponses.add("api.foo.com", "/never", "get")
+
+    async with aiohttp.ClientSession() as session:
+        for method, url in [
+            ("GET", "http://api.foo.com/users"),
+            ("GET", "http://other.com/users"),
+            ("POST", "http://api.foo.com/users"),
+            ("GET", "http://api.foo.com/users?page=2"),
+        ]:
+            async with session.request(method, url) as response:
+                await response.read()
+        middle = time.monotonic()
+        for url in ["http://api.foo.com/users", "http://other.com/"]:
+            async with session.get(url) as response:
+                await response.read()
+
+    assert [log.request.path_qs for log in aresponses.calls_for(users)] == [
+        "/users",
+        "/users?page=2",
+        "/users",
+    ]
+    assert aresponses.call_count(create) == 1
+    assert aresponses.call_count(host="API.foo.com") == 4
+    assert aresponses.call_count(method="get", path="/users") == 4
+    assert aresponses.call_count(other, path="/") == 1
+    assert aresponses.call_count(users, since=middle) == 1
+    assert aresponses.call_count(since=middle) == 2
+    assert aresponses.call_count(until=middle) == 4
+    assert [log.route for log in aresponses.calls_for(until=middle)] == [
+        users,
+        other,
+        create,
+        users,
+    ]
+
+    aresponses.assert_called(users, times=3)
+    aresponses.assert_called(create)
+    aresponses.assert_called(host="other.com", times=2)
+    aresponses.assert_called(unused, times=0)
+    with pytest.raises(UnexpectedCallCountError, match="called 2 times, but was"):
+        aresponses.assert_called(create, times=2)
+    with pytest.raises(UnexpectedCallCountError, match="at least once"):
+        aresponses.assert_called(path="/missing")
+
+    aresponses.clear_history()
+    assert aresponses.call_count(users) == 0
+    assert aresponses.history_times.tolist() == []
+
+
+class _Request:
+    def __init__(self, host, method, path):
+        self.host, self.method, self.path = host, method, path
+
+
+def test_history_index_out_of_order():
+    index = HistoryIndex()
+    for arrived in [1.0, 3.0, 2.0, 5.0, 4.0]:
+        index.add(None, _Request("foo.com", "GET", "/"), arrived)
+
+    assert list(index.window(2.0, 4.0)) == [1, 2]
+    index.add("route", _Request("foo.com", "GET", "/x"), 2.5)
+    assert list(index.window(2.0, 4.0)) == [1, 2, 5]
+    assert index.positions(route="route", path="/x") == [5]
+    assert index.count(host="foo.com", method="get") == 6
+
+
+@pytest.mark.asyncio
+async def test_history_modified_directly(aresponses):
+    route = aresponses.add("foo.com", response="hi", repeat=aresponses.INFINITY)
+
+    async def get():
+        async with aiohttp.ClientSession() as session:
+            async with session.get("http://foo.com/") as response:
+                await response.read()
+
+    await get()
+    await get()
+    aresponses.history.pop()
+    with pytest.raises(RuntimeError, match="clear_history"):
+        aresponses.calls_for(route)
+    with pytest.raises(RuntimeError, match="clear_history"):
+        aresponses.call_count(route)
+
+    # emptying it still works, as it did before clear_history()
+    aresponses.history.clear()
+    assert aresponses.call_count(route) == 0
+    await get()
+    assert [log.route for log in aresponses.calls_for(route)] == [route]
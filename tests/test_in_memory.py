@@ -0,0 +1,147 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp.client_reqrep import ClientRequest
+from aiohttp.connector import BaseConnector, TCPConnector
+
+from aresponses import ResponsesMockServer
+from aresponses.errors import NoRouteFoundError
+from aresponses.main import asyncio_fixture
+
+
+@asyncio_fixture()
+async def aresponses():
+    loop = asyncio.get_running_loop()
+    async with ResponsesMockServer(loop=loop, in_memory=True) as server:
+        yield server
+
+
+@pytest.mark.asyncio
+async def test_in_memory(aresponses):
+    aresponses.add("foo.com", "/", "get", "hi there!!")
+    aresponses.add("foo.com", "/", "get", aresponses.Response(text="error", status=500))
+    aresponses.add("foo.com", "/", "get", {"status": "ok"})
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com") as response:
+            assert await response.text() == "hi there!!"
+            assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+        async with session.get("https://foo.com") as response:
+            assert response.status == 500
+            assert await response.text() == "error"
+        async with session.get("http://foo.com") as response:
+            assert await response.json() == {"status": "ok"}
+
+    assert not aresponses.started
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_history(aresponses):
+    def echo(request):
+        return aresponses.Response(
+            text=f"{request.method} {request.path_qs}",
+            headers={"X-Host": request.host},
+        )
+
+    aresponses.add("bar.com", "/zzz", "post", echo, body_pattern="hello")
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post("http://bar.com/zzz?a=1", data="hello") as response:
+            assert await response.text() == "POST /zzz?a=1"
+            assert response.headers["X-Host"] == "bar.com"
+
+    assert len(aresponses.history) == 1
+    assert aresponses.history[0].request.host == "bar.com"
+    assert await aresponses.history[0].request.read() == b"hello"
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_unmatched(aresponses):
+    aresponses.raise_on_unmatched()
+
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(NoRouteFoundError):
+            async with session.get("http://foo.com/a"):
+                pass
+
+    with pytest.raises(NoRouteFoundError):
+        aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_faults(aresponses):
+    aresponses.add(
+        "foo.com", "/", "post", "x" * 1000, faults=aresponses.FaultProfile(reset_rate=1)
+    )
+    aresponses.add("foo.com", "/", "post", faults=aresponses.FaultProfile(drop_rate=1))
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post("http://foo.com/") as response:
+            with pytest.raises(aiohttp.ClientPayloadError):
+                await response.read()
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            async with session.post("http://foo.com/"):
+                pass
+
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_raw_response_unsupported(aresponses):
+    raw = aresponses.RawResponse(b"HTTP/1.1 200 OK\r\n\r\n")
+    with pytest.raises(ValueError):
+        aresponses.add(response=raw)
+    with pytest.raises(ValueError):
+        aresponses.add(response=aresponses.WebSocket(echo=True))
+
+    # handlers can still return one, which fails the request
+    aresponses.add(response=lambda request: raw)
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(NotImplementedError):
+            async with session.get("http://foo.com/"):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_in_memory_compressed(aresponses):
+    aresponses.add("foo.com", "/", "get", "hi" * 100, compress=True, repeat=2)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com") as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert await response.text() == "hi" * 100
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        async with session.get("http://foo.com") as response:
+            assert len(await response.read()) < 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("in_memory", [True, False])
+async def test_patches_are_undone(in_memory):
+    loop = asyncio.get_running_loop()
+    connect = BaseConnector.connect
+    send = ClientRequest.send
+    async with ResponsesMockServer(loop=loop, in_memory=in_memory):
+        assert (TCPConnector.connect is not connect) is in_memory
+
+    assert "connect" not in vars(TCPConnector)
+    assert TCPConnector.connect is connect
+    assert ClientRequest.send is send
+
+
+@pytest.mark.asyncio
+async def test_in_memory_marks_ssl_requests(aresponses):
+    aresponses.add("foo.com", response="hi", repeat=2)
+
+    async with aiohttp.ClientSession() as session:
+        for url in ["https://foo.com/", "http://foo.com/"]:
+            async with session.get(url) as response:
+                assert "AResponsesIsSSL" not in response.request_info.headers
+
+    assert [log.request.headers["AResponsesIsSSL"] for log in aresponses.history] == [
+        "1",
+        "",
+    ]
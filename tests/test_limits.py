@@ -0,0 +1,128 @@
+import asyncio
+import math
+
+import aiohttp
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_rejects_with_retry_after(aresponses):
+    limit = aresponses.RateLimit(rate=1, burst=2)
+    aresponses.add("foo.com", "/", "get", "hi", repeat=math.inf, limit=limit)
+
+    async with aiohttp.ClientSession() as session:
+        statuses = []
+        for _ in range(4):
+            async with session.get("http://foo.com/") as response:
+                statuses.append(response.status)
+                retry_after = response.headers.get("Retry-After")
+
+    assert statuses == [200, 200, 429, 429]
+    assert retry_after == "1"
+    assert limit.stats == {
+        "accepted": 2,
+        "rejected": 2,
+        "queued": 0,
+        "in_flight": 0,
+        "peak_in_flight": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_queues(aresponses):
+    limit = aresponses.RateLimit(rate=50, burst=1, queue=True)
+    aresponses.add("foo.com", "/", "get", "hi", repeat=math.inf, limit=limit)
+
+    loop = asyncio.get_running_loop()
+    async with aiohttp.ClientSession() as session:
+
+        async def get():
+            async with session.get("http://foo.com/") as response:
+                return response.status
+
+        start = loop.time()
+        statuses = await asyncio.gather(*(get() for _ in range(6)))
+        elapsed = loop.time() - start
+
+    assert statuses == [200] * 6
+    assert elapsed >= 0.09
+    assert limit.queued == 5
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight(aresponses):
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return aresponses.Response(text="done")
+
+    limit = aresponses.RateLimit(max_in_flight=2, retry_after=5)
+    aresponses.limit_host("foo.com", limit)
+    aresponses.add("foo.com", "/", "get", slow, repeat=math.inf)
+
+    async with aiohttp.ClientSession() as session:
+
+        async def get():
+            async with session.get("http://foo.com/") as response:
+                return response.status, response.headers.get("Retry-After")
+
+        tasks = [asyncio.ensure_future(get()) for _ in range(2)]
+        while limit.in_flight < 2:
+            await asyncio.sleep(0.01)
+        assert await get() == (503, "5")
+        release.set()
+        assert await asyncio.gather(*tasks) == [(200, None), (200, None)]
+
+    assert limit.peak_in_flight == 2
+    assert limit.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_requests_dont_use_up_the_route(aresponses):
+    limit = aresponses.RateLimit(rate=20, burst=1)
+    aresponses.add("foo.com", "/", "get", "hi", repeat=3, limit=limit)
+
+    async with aiohttp.ClientSession() as session:
+
+        async def get():
+            async with session.get("http://foo.com/") as response:
+                return response.status
+
+        statuses = [await get() for _ in range(3)]
+        for _ in range(2):
+            await asyncio.sleep(0.06)
+            statuses.append(await get())
+
+    assert statuses == [200, 429, 429, 200, 200]
+    assert limit.rejected == 2
+    aresponses.assert_all_requests_matched()
+    aresponses.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight_holds_slot_while_sending(aresponses):
+    limit = aresponses.RateLimit(max_in_flight=1)
+    # more than the socket buffers take in while the client isn't reading
+    body = b"x" * 16_000_000
+    aresponses.add(
+        "foo.com", "/", "get", aresponses.Response(body=body), repeat=2, limit=limit
+    )
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/") as slow:
+            for _ in range(100):
+                if limit.in_flight:
+                    break
+                await asyncio.sleep(0.01)
+            # still sending the body the client hasn't read yet
+            assert limit.in_flight == 1
+            async with session.get("http://foo.com/") as response:
+                assert response.status == 503
+            assert len(await slow.read()) == len(body)
+        async with session.get("http://foo.com/") as response:
+            assert len(await response.read()) == len(body)
+
+    assert limit.stats["rejected"] == 1
+    assert limit.peak_in_flight == 1
+    aresponses.assert_no_unused_routes()
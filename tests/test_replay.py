@@ -0,0 +1,88 @@
+import math
+
+import aiohttp
+import pytest
+
+from aresponses.replay import (
+    ReplayReport,
+    ReplayRequest,
+    history_requests,
+    load_requests,
+    replay,
+    save_requests,
+)
+from aresponses.standalone import StandaloneServer
+
+
+@pytest.mark.asyncio
+async def test_replay_history(aresponses, tmp_path):
+    aresponses.add("foo.com", response="hi", repeat=math.inf)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/a?x=1", headers={"X-Id": "1"}):
+            pass
+        async with session.post("https://foo.com/b", data=b"\x00body"):
+            pass
+
+    requests = await history_requests(aresponses)
+    assert [(r.method, r.url) for r in requests] == [
+        ("GET", "http://foo.com/a?x=1"),
+        ("POST", "https://foo.com/b"),
+    ]
+    assert requests[0].offset == 0
+    assert requests[0].headers["X-Id"] == "1"
+    assert "AResponsesIsSSL" not in requests[1].headers
+    assert requests[1].body == b"\x00body"
+
+    path = tmp_path / "requests.jsonl"
+    save_requests(requests, path)
+    assert load_requests(path) == requests
+
+    report = await replay(requests * 10, concurrency=4)
+    assert report.requests == 20
+    assert report.errors == 0
+    assert report.statuses == {200: 20}
+    assert len(aresponses.history) == 22
+    assert "p99=" in str(report)
+
+
+@pytest.mark.asyncio
+async def test_replay_against_target():
+    server = StandaloneServer(port=0)
+    server.add("foo.com", "/a", "get", "hi", repeat=math.inf)
+    await server.start_server()
+    try:
+        requests = [
+            ReplayRequest(0.0, "GET", "http://foo.com/a", {}, b""),
+            ReplayRequest(0.001, "GET", "http://foo.com/missing", {}, b""),
+        ]
+        report = await replay(
+            requests, target=str(server.make_url("/")), duration=0.2, concurrency=2
+        )
+    finally:
+        await server.close()
+
+    # the two requests alternate until the deadline
+    assert report.statuses[200] > 1
+    assert abs(report.statuses[200] - report.statuses[404]) <= 1
+    assert report.elapsed >= 0.2
+    assert server.history[0].request.host == "foo.com"
+
+
+def test_report_percentiles():
+    report = ReplayReport(4, 0, 2.0, {}, [0.4, 0.1, 0.3, 0.2])
+    assert report.throughput == 2.0
+    assert report.percentile(50) == 0.2
+    assert report.percentile(99) == 0.4
+
+
+def test_schedule_paces_and_loops():
+    from aresponses.replay import _schedule
+
+    requests = [
+        ReplayRequest(0.0, "GET", "http://foo.com/", {}, b""),
+        ReplayRequest(1.0, "GET", "http://foo.com/", {}, b""),
+    ]
+    assert [due for due, _ in _schedule(requests, 2, None)] == [0.0, 0.5]
+    looping = _schedule(requests, 1, 10)
+    assert [next(looping)[0] for _ in range(4)] == [0.0, 1.0, 2.0, 3.0]
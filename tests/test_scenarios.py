@@ -0,0 +1,109 @@
+import math
+
+import aiohttp
+import pytest
+
+from aresponses.errors import (
+    NoRouteFoundError,
+    UnexpectedScenarioStateError,
+    UnusedRouteError,
+)
+
+
+@pytest.mark.asyncio
+async def test_scenario_flow(aresponses):
+    flow = aresponses.Scenario("listing")
+    aresponses.add(
+        "api.foo.com",
+        "/login",
+        "post",
+        {"token": "a"},
+        scenario=flow,
+        next_state="authenticated",
+    )
+    aresponses.add(
+        "api.foo.com",
+        "/items",
+        "get",
+        aresponses.Response(status=401),
+        scenario=flow,
+        state="authenticated",
+        next_state="expired",
+    )
+    aresponses.add(
+        "api.foo.com",
+        "/refresh",
+        "post",
+        {"token": "b"},
+        scenario=flow,
+        state="expired",
+        next_state="page 1",
+    )
+    for page, next_page in [(1, 2), (2, None)]:
+        aresponses.add(
+            "api.foo.com",
+            "/items",
+            "get",
+            {"page": page},
+            scenario=flow,
+            state=f"page {page}",
+            next_state=f"page {next_page}" if next_page else "done",
+        )
+    # outside the scenario, only used once the scenario has no route left
+    aresponses.add("api.foo.com", "/items", "get", {"page": "fallback"})
+
+    async with aiohttp.ClientSession() as session:
+
+        async def call(method, path):
+            async with session.request(method, f"http://api.foo.com{path}") as r:
+                return r.status, await r.json() if r.status == 200 else None
+
+        assert await call("post", "/login") == (200, {"token": "a"})
+        assert await call("get", "/items") == (401, None)
+        assert await call("post", "/refresh") == (200, {"token": "b"})
+        assert await call("get", "/items") == (200, {"page": 1})
+        assert await call("get", "/items") == (200, {"page": 2})
+        assert await call("get", "/items") == (200, {"page": "fallback"})
+
+    flow.assert_state("done")
+    assert flow.visited == [
+        "start",
+        "authenticated",
+        "expired",
+        "page 1",
+        "page 2",
+        "done",
+    ]
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_scenario_only_checks_current_state(aresponses):
+    flow = aresponses.Scenario("flow", initial_state="a")
+    aresponses.add("foo.com", "/a", "get", "a", scenario=flow, next_state="b")
+    aresponses.add(
+        "foo.com", "/b", "get", "b", scenario=flow, state="b", repeat=math.inf
+    )
+    aresponses.add("foo.com", "/c", "get", "c", scenario=flow, state="c")
+
+    async with aiohttp.ClientSession() as session:
+        for path in ["/b", "/a", "/b", "/b"]:
+            async with session.get(f"http://foo.com{path}") as response:
+                await response.text()
+
+    assert [log.route is not None for log in aresponses.history] == [
+        False,
+        True,
+        True,
+        True,
+    ]
+    with pytest.raises(UnexpectedScenarioStateError, match="'flow' is in state 'b'"):
+        flow.assert_state("c")
+    with pytest.raises(UnusedRouteError):
+        aresponses.assert_no_unused_routes()
+    assert [route.path_pattern for route in flow.routes("c")] == ["/c"]
+
+    (diagnosis,) = aresponses.diagnose_unmatched_requests()
+    assert "only in state 'b' of scenario 'flow'" in diagnosis.reason
+    with pytest.raises(NoRouteFoundError):
+        aresponses.assert_all_requests_matched()
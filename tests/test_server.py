@@ -7,6 +7,7 @@ import sys
 from aiohttp import ServerDisconnectedError
 
 import aresponses as aresponses_mod
+from aresponses.utils import ANY, _compile_pattern
 
 # example test in readme.md
 from aresponses.errors import (
@@ -421,3 +422,237 @@ async def test_not_exceeding_recursion_limit():
             async with aiohttp.ClientSession() as session:
                 async with session.get("http://fake-host"):
                     pass
+
+
+@pytest.mark.asyncio
+async def test_response_kind_classified_on_add(aresponses):
+    async def coroutine_handler(request):
+        return aresponses.Response(text="coroutine")
+
+    aresponses.add("foo.com", "/text", "get", "text", repeat=2)
+    aresponses.add("foo.com", "/json", "get", {"status": "ok"}, repeat=2)
+    aresponses.add(
+        "foo.com", "/static", "get", aresponses.Response(text="hi"), repeat=2
+    )
+    aresponses.add("foo.com", "/callable", "get", lambda r: aresponses.Response())
+    aresponses.add("foo.com", "/coroutine", "get", coroutine_handler)
+
+    kinds = [route.response_kind for route in aresponses._responses]
+    assert kinds == ["text", "json", "static", "callable", "coroutine"]
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(2):
+            async with session.get("http://foo.com/text") as response:
+                assert await response.text() == "text"
+                assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+            async with session.get("http://foo.com/json") as response:
+                assert await response.json() == {"status": "ok"}
+            async with session.get("http://foo.com/static") as response:
+                assert await response.text() == "hi"
+        async with session.get("http://foo.com/callable") as response:
+            assert response.status == 200
+        async with session.get("http://foo.com/coroutine") as response:
+            assert await response.text() == "coroutine"
+
+    aresponses.assert_all_requests_matched()
+    aresponses.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_routing_index_keeps_insertion_order(aresponses):
+    aresponses.add("foo.com", "/", "get", "literal first")
+    aresponses.add(re.compile(r"foo\.com"), "/", "get", "regex")
+    aresponses.add("foo.com", "/", "get", "literal last")
+    for i in range(1000):
+        aresponses.add(f"host{i}.com", "/", "get", f"host {i}")
+
+    async with aiohttp.ClientSession() as session:
+        for expected in ["literal first", "regex", "literal last"]:
+            async with session.get("http://foo.com/") as response:
+                assert await response.text() == expected
+        async with session.get("http://host999.com/") as response:
+            assert await response.text() == "host 999"
+
+    aresponses.assert_all_requests_matched()
+    assert len(aresponses._responses) == 999
+
+
+@pytest.mark.asyncio
+async def test_header_and_query_matchers(aresponses):
+    aresponses.add(
+        "foo.com",
+        "/items",
+        "get",
+        "page 2",
+        query={"page": "2", "sort": re.compile("^(asc|desc)$")},
+    )
+    aresponses.add("foo.com", "/items", "get", "admin", headers={"X-Role": "admin"})
+    aresponses.add("foo.com", "/items", "get", "any role", headers={"x-role": ANY})
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/items?sort=desc&page=2") as response:
+            assert await response.text() == "page 2"
+        async with session.get(
+            "http://foo.com/items", headers={"x-role": "admin"}
+        ) as response:
+            assert await response.text() == "admin"
+        async with session.get(
+            "http://foo.com/items", headers={"X-Role": "guest"}
+        ) as response:
+            assert await response.text() == "any role"
+        async with session.get("http://foo.com/items?page=2") as response:
+            assert response.status == 500
+
+    aresponses.add("foo.com", "/items", "get", "late", query={"page": "3"})
+    (diagnosis,) = aresponses.diagnose_unmatched_requests()
+    assert diagnosis.mismatched == ("query",)
+
+
+@pytest.mark.asyncio
+async def test_routing_index_by_header_and_query():
+    loop = asyncio.get_running_loop()
+    async with aresponses_mod.ResponsesMockServer(
+        loop=loop, index_headers=["X-Tenant"], index_query=["v"]
+    ) as arsps:
+        arsps.add("foo.com", "/", "get", "tenant a", headers={"x-tenant": "a"})
+        arsps.add("foo.com", "/", "get", "v2", query={"v": "2"}, repeat=2)
+        arsps.add("foo.com", "/", "get", "anyone")
+        for i in range(1000):
+            arsps.add(
+                "foo.com", "/", "get", f"tenant {i}", headers={"X-Tenant": str(i)}
+            )
+
+        assert len(arsps._responses._buckets) == 1003
+        async with aiohttp.ClientSession() as session:
+            for headers, url, expected in [
+                ({"X-Tenant": "a"}, "http://foo.com/?v=2", "tenant a"),
+                ({"X-Tenant": "999"}, "http://foo.com/?v=1&v=2", "v2"),
+                ({"X-Tenant": "999"}, "http://foo.com/?v=2", "v2"),
+                ({"X-Tenant": "999"}, "http://foo.com/", "anyone"),
+                ({"X-Tenant": "999"}, "http://foo.com/", "tenant 999"),
+            ]:
+                async with session.get(url, headers=headers) as response:
+                    assert await response.text() == expected
+
+        arsps.assert_all_requests_matched()
+        assert len(arsps._responses) == 999
+
+
+@pytest.mark.asyncio
+async def test_compact_history():
+    loop = asyncio.get_running_loop()
+    async with aresponses_mod.ResponsesMockServer(
+        loop=loop, compact_history=True
+    ) as arsps:
+        arsps.add("foo.com", "/", "post", {"ok": True})
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                "http://foo.com/?a=1&a=2", json={"x": 1}, headers={"X-Id": "7"}
+            ) as response:
+                assert await response.json() == {"ok": True}
+
+    request, route, response = arsps.history[0]
+    assert not hasattr(route, "__dict__")
+    assert (request.method, request.host, request.path) == ("POST", "foo.com", "/")
+    assert request.query.getall("a") == ["1", "2"]
+    assert request.headers["x-id"] == "7"
+    assert await request.json() == {"x": 1}
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("application/json")
+    assert response.text == '{"ok": true}'
+
+
+@pytest.mark.asyncio
+async def test_unmatched_request_diagnosis(aresponses):
+    aresponses.add("foo.com", "/a", "get", "hi")
+    aresponses.add("foo.com", "/b", "post", "hi", body_pattern="apple")
+    aresponses.add(re.compile(r".*\.bar\.com"), "/c", "get", "hi")
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/a") as response:
+            await response.text()
+        for method, url in [
+            ("GET", "http://foo.com/a"),
+            ("PUT", "http://foo.com/a"),
+            ("POST", "http://foo.com/b"),
+            ("GET", "http://api.bar.com/x"),
+            ("GET", "http://baz.com/zzz"),
+        ]:
+            try:
+                async with session.request(method, url, data="pear") as response:
+                    await response.text()
+            except ServerDisconnectedError:
+                pass
+
+    early = aresponses.diagnose_unmatched_requests()
+    assert "added after the request" not in early[4].reason
+    # routes added after a diagnosis are bucketed on the next one
+    aresponses.add("baz.com", "/zzz", "get", "late")
+
+    diagnoses = aresponses.diagnose_unmatched_requests()
+    assert [d.mismatched for d in diagnoses] == [
+        (),
+        ("method",),
+        ("body",),
+        ("path",),
+        (),
+    ]
+    assert "already been used up" in diagnoses[0].reason
+    assert "added after the request" in diagnoses[4].reason
+
+    with pytest.raises(NoRouteFoundError) as exc_info:
+        aresponses.assert_all_requests_matched()
+    message = str(exc_info.value)
+    assert message.startswith("No match found for request: GET foo.com /a")
+    assert "does not match its method" in message
+    assert message.count("No match found for request") == 5
+
+
+@pytest.mark.asyncio
+async def test_unmatched_response(aresponses):
+    aresponses.set_unmatched_response("nothing here", status=418, delay=0.01)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get("http://foo.com/a") as response:
+            assert response.status == 418
+            assert await response.text() == "nothing here"
+        async with session.get("http://foo.com/b") as response:
+            assert response.status == 418
+
+    assert len(aresponses.history) == 2
+    with pytest.raises(NoRouteFoundError):
+        aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_unmatched_raises_in_requesting_task(aresponses):
+    aresponses.raise_on_unmatched()
+
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(NoRouteFoundError, match="GET foo.com /a"):
+            async with session.get("http://foo.com/a"):
+                pass
+
+    with pytest.raises(NoRouteFoundError):
+        aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_unmatched_reset(aresponses):
+    aresponses.reset_on_unmatched()
+
+    async with aiohttp.ClientSession() as session:
+        with pytest.raises(aiohttp.ClientConnectionError):
+            async with session.post("http://foo.com/a", data="x"):
+                pass
+
+    with pytest.raises(NoRouteFoundError):
+        aresponses.assert_all_requests_matched()
+
+
+def test_compiled_str_pattern_only_matches_equal_text():
+    match = _compile_pattern("foo")
+    assert match("foo") is True
+    assert match("bar") is False
+    assert match(None) is False
+    assert match(b"foo") is False
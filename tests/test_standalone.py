@@ -0,0 +1,182 @@
+import json
+
+import aiohttp
+import pytest
+
+from aresponses.cli import make_parser
+from aresponses.standalone import StandaloneServer, load_route_file
+
+ROUTES = {
+    "routes": [
+        {
+            "host": "api.example.com",
+            "path": {"regex": r"^/users/\d+$"},
+            "method": "get",
+            "response": {"status": 200, "json": {"name": "foo"}},
+            "repeat": None,
+        },
+        {
+            "host": "api.example.com",
+            "path": "/slow",
+            "response": {"body": "done", "delay": 0.01, "headers": {"X-Foo": "1"}},
+        },
+        {"path": "/unused", "response": "never"},
+    ]
+}
+
+
+@pytest.fixture()
+def route_file(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(ROUTES))
+    return path
+
+
+@pytest.mark.asyncio
+async def test_standalone_server(route_file):
+    server = load_route_file(route_file, port=0)
+    await server.start_server()
+    server.host_map[f"127.0.0.1:{server.port}"] = "api.example.com"
+    try:
+        async with aiohttp.ClientSession() as session:
+            for _ in range(3):
+                async with session.get(server.make_url("/users/1")) as response:
+                    assert await response.json() == {"name": "foo"}
+
+            async with session.get(server.make_url("/slow")) as response:
+                assert await response.text() == "done"
+                assert response.headers["X-Foo"] == "1"
+
+            async with session.get(
+                server.make_url("/users/1"), headers={"Host": "other.example.com"}
+            ) as response:
+                assert response.status == 404
+
+            async with session.get(server.make_url("/__aresponses__/history")) as r:
+                history = await r.json()
+            async with session.get(server.make_url("/__aresponses__/metrics")) as r:
+                metrics = await r.json()
+            async with session.get(server.make_url("/__aresponses__/assertions")) as r:
+                assertions = await r.json()
+    finally:
+        await server.close()
+
+    assert len(history) == 5
+    assert history[0]["host"] == "api.example.com"
+    assert history[0]["status"] == 200
+    assert history[4] == {
+        "method": "GET",
+        "host": "other.example.com",
+        "path": "/users/1",
+        "matched": False,
+        "route": None,
+        "status": 404,
+    }
+    assert metrics["requests"] == 5
+    assert metrics["matched"] == 4
+    assert metrics["unmatched"] == 1
+    assert metrics["routes_remaining"] == 2
+    assert not assertions["passed"]
+    assert "Unused Route" in assertions["errors"]["assert_no_unused_routes"]
+    assert "GET other.example.com" in (
+        assertions["errors"]["assert_all_requests_matched"]
+    )
+
+
+def test_route_spec_validation():
+    server = StandaloneServer()
+    with pytest.raises(ValueError, match="Unknown route options: hots"):
+        server.add_route_spec({"hots": "foo.com"})
+    with pytest.raises(ValueError, match="Unknown response options: stauts"):
+        server.add_route_spec({"response": {"stauts": 500}})
+
+
+def test_cli_arguments():
+    args = make_parser().parse_args(
+        ["serve", "routes.json", "--port", "9000", "--map-host", "localhost=foo.com"]
+    )
+    assert args.routes == "routes.json"
+    assert args.port == 9000
+    assert args.map_host == [("localhost", "foo.com")]
+
+
+@pytest.mark.asyncio
+async def test_standalone_scenarios():
+    server = StandaloneServer(port=0)
+    server.load_spec(
+        {
+            "scenarios": {
+                "login": {
+                    "states": {
+                        "start": [
+                            {
+                                "path": "/login",
+                                "response": "token",
+                                "next_state": "authenticated",
+                            }
+                        ],
+                        "authenticated": [{"path": "/items", "response": {"json": []}}],
+                    }
+                }
+            }
+        }
+    )
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            statuses = []
+            for path in ["/items", "/login", "/items"]:
+                async with session.get(server.make_url(path)) as response:
+                    statuses.append(response.status)
+    finally:
+        await server.close()
+
+    assert statuses == [404, 200, 200]
+    assert server.metrics()["scenarios"] == {
+        "login": {"state": "authenticated", "visited": ["start", "authenticated"]}
+    }
+
+
+@pytest.mark.asyncio
+async def test_standalone_assertions_ignore_infinite_routes():
+    server = StandaloneServer(port=0)
+    server.load_spec({"routes": [{"path": "/users", "response": "[]", "repeat": None}]})
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(server.make_url("/users")) as response:
+                assert response.status == 200
+            async with session.get(server.make_url("/__aresponses__/assertions")) as r:
+                assertions = await r.json()
+    finally:
+        await server.close()
+
+    assert assertions == {
+        "passed": True,
+        "errors": {
+            "assert_no_unused_routes": None,
+            "assert_called_in_order": None,
+            "assert_all_requests_matched": None,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_standalone_metrics_after_clear_history():
+    server = StandaloneServer(port=0)
+    server.load_spec({"routes": [{"path": "/users", "response": "[]", "repeat": None}]})
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(server.make_url("/users")) as response:
+                assert response.status == 200
+            server.clear_history()
+            async with session.get(server.make_url("/items")) as response:
+                assert response.status == 404
+    finally:
+        await server.close()
+
+    metrics = server.metrics()
+    assert metrics["requests"] == 2
+    assert metrics["matched"] == 1
+    assert metrics["unmatched"] == 1
@@ -0,0 +1,118 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import WSMsgType
+
+from aresponses import WebSocket
+
+
+async def _receive_all(ws):
+    messages = []
+    async for message in ws:
+        if message.type == WSMsgType.TEXT:
+            messages.append(message.data)
+        elif message.type == WSMsgType.BINARY:
+            messages.append(message.data)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_websocket_script(aresponses):
+    socket = WebSocket(
+        ["hello", WebSocket.RECEIVE, {"n": 1}, b"\x00\x01"], keep_received=True
+    )
+    aresponses.add("stream.foo.com", "/ws", "get", socket)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect("wss://stream.foo.com/ws") as ws:
+            assert await ws.receive_str() == "hello"
+            await ws.send_str("subscribe")
+            assert await _receive_all(ws) == ['{"n": 1}', b"\x00\x01"]
+
+    await asyncio.sleep(0.05)
+    (stats,) = socket.connections
+    assert stats.received == ["subscribe"]
+    assert (stats.frames_sent, stats.bytes_sent) == (3, 15)
+    assert (stats.frames_received, stats.bytes_received) == (1, 9)
+    assert stats.closed
+    assert aresponses.history[0].response.status == 101
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_websocket_frames_and_echo(aresponses):
+    async def ticker(request):
+        for i in range(3):
+            yield {"tick": i, "path": request.path}
+
+    aresponses.add("foo.com", "/ticks", "get", WebSocket(frames=ticker))
+    echo = WebSocket(echo=True, keep_received=2)
+    aresponses.add("foo.com", "/echo", "get", echo)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect("ws://foo.com/ticks") as ws:
+            assert [m for m in await _receive_all(ws)] == [
+                '{"tick": 0, "path": "/ticks"}',
+                '{"tick": 1, "path": "/ticks"}',
+                '{"tick": 2, "path": "/ticks"}',
+            ]
+        async with session.ws_connect("ws://foo.com/echo") as ws:
+            for i in range(10):
+                await ws.send_str(f"ping {i}")
+                assert await ws.receive_str() == f"ping {i}"
+            await ws.send_bytes(b"raw")
+            assert await ws.receive_bytes() == b"raw"
+
+    assert echo.stats == {
+        "connections": 1,
+        "frames_sent": 11,
+        "bytes_sent": 63,
+        "frames_received": 11,
+        "bytes_received": 63,
+    }
+    assert list(echo.connections[0].received) == ["ping 9", b"raw"]
+
+
+@pytest.mark.asyncio
+async def test_websocket_broadcast(aresponses):
+    paced = WebSocket(broadcast=lambda i: str(i), rate=2000, count=200)
+    flood = WebSocket(broadcast=b"x" * 1024, count=20000)
+    aresponses.add("foo.com", "/paced", "get", paced)
+    aresponses.add("foo.com", "/flood", "get", flood)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect("ws://foo.com/paced") as ws:
+            started = asyncio.get_running_loop().time()
+            messages = await _receive_all(ws)
+            elapsed = asyncio.get_running_loop().time() - started
+        assert messages == [str(i) for i in range(200)]
+        assert elapsed >= 0.09
+
+        async with session.ws_connect("ws://foo.com/flood") as ws:
+            assert len(await _receive_all(ws)) == 20000
+
+    assert flood.stats["bytes_sent"] == 20000 * 1024
+
+
+@pytest.mark.asyncio
+async def test_websocket_client_disconnects(aresponses):
+    endless = WebSocket(broadcast="tick", rate=1000)
+    aresponses.add("foo.com", "/", "get", endless)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect("ws://foo.com/") as ws:
+            for _ in range(5):
+                assert await ws.receive_str() == "tick"
+
+    await asyncio.sleep(0.05)
+    (stats,) = endless.connections
+    assert stats.closed
+    assert stats.frames_sent >= 5
+
+
+def test_websocket_validation():
+    with pytest.raises(ValueError):
+        WebSocket(rate=10)
+    with pytest.raises(ValueError):
+        WebSocket(broadcast="x", rate=0)